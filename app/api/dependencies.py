@@ -1,12 +1,23 @@
+import secrets
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, status
+from app.config import settings
 from app.database.session import get_session
 from app.services.shipment import ShipmentService
 from sqlalchemy.ext.asyncio import AsyncSession
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
 
-def get_shipment_service(session: SessionDep):
+async def get_shipment_service(session: SessionDep):
     return ShipmentService(session)
 
-ServiceDep = Annotated[ShipmentService, Depends(get_shipment_service)]
\ No newline at end of file
+ServiceDep = Annotated[ShipmentService, Depends(get_shipment_service)]
+
+async def require_profiling_token(x_profiling_token: Annotated[str, Header()] = ""):
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    ### An unset token locks the endpoint rather than opening it
+    if not settings.PROFILING_TOKEN or not secrets.compare_digest(
+        x_profiling_token.encode(), settings.PROFILING_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
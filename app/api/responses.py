@@ -0,0 +1,147 @@
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Coroutine
+
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+
+from app.api.schemas.shipment import ShipmentRead
+from app.database.models import Shipment
+from app.tracing import TracedRoute
+
+try:
+    import msgpack
+except ImportError:  # MessagePack support is optional
+    msgpack = None
+
+SHIPMENT_READ_FIELDS = tuple(ShipmentRead.model_fields)
+SHIPMENT_FIELDS = tuple(Shipment.model_fields)
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+### Set per request by NegotiatedRoute when the client accepts MessagePack
+response_msgpack: ContextVar[bool] = ContextVar("response_msgpack", default=False)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def respond(content: Any, status_code: int = 200, headers: dict[str, str] | None = None) -> Response:
+    response_class = MsgPackResponse if response_msgpack.get() else ORJSONResponse
+    return response_class(content, status_code=status_code, headers=headers)
+
+
+def representation_etag(tag: str) -> str:
+    """Strong ETags are per representation, so the MessagePack one gets a suffix."""
+    return f'"{tag}-msgpack"' if response_msgpack.get() else f'"{tag}"'
+
+
+def _is_msgpack(media_type: str) -> bool:
+    return media_type.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def _prefers_msgpack(accept: str) -> bool:
+    """MessagePack only when it's ranked strictly above JSON, q=0 means not acceptable."""
+    msgpack_q = json_q = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return msgpack_q > json_q
+
+
+class MsgPackRequest(Request):
+    ### FastAPI parses bodies through .json(), here it decodes MessagePack instead
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedRoute(TracedRoute):
+    """
+    Route that speaks MessagePack besides JSON: request bodies are decoded
+    from MessagePack when Content-Type says so, and responses built with
+    respond() are encoded as MessagePack when Accept asks for it.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if _is_msgpack(request.headers.get("content-type", "")):
+                if msgpack is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="MessagePack is not supported by this server",
+                    )
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, b"application/json" if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+
+            wants_msgpack = msgpack is not None and _prefers_msgpack(request.headers.get("accept", ""))
+            token = response_msgpack.set(wants_msgpack)
+            try:
+                response = await handler(request)
+            finally:
+                response_msgpack.reset(token)
+            if msgpack is not None:
+                ### Shared caches must not hand one format to a client asking for the other
+                response.headers.add_vary_header("Accept")
+            return response
+
+        return negotiated_handler
+
+
+### Rows coming from the database are already valid, so they're turned into
+### plain dicts once and handed to the encoder without another pydantic pass.
+### The one coercion kept: SQLite hands back whole-number REAL values from
+### UPDATE/DELETE ... RETURNING as ints, which would encode as 3 not 3.0.
+
+FLOAT_FIELDS = tuple(name for name, field in Shipment.model_fields.items() if field.annotation is float)
+
+
+def _shipment_dict(shipment: Shipment, fields: tuple[str, ...]) -> dict[str, Any]:
+    row = {field: getattr(shipment, field) for field in fields}
+    for field in FLOAT_FIELDS:
+        if field in row and type(row[field]) is int:
+            row[field] = float(row[field])
+    return row
+
+
+def shipment_read(shipment: Shipment) -> dict[str, Any]:
+    return _shipment_dict(shipment, SHIPMENT_READ_FIELDS)
+
+
+def shipment_full(shipment: Shipment) -> dict[str, Any]:
+    return _shipment_dict(shipment, SHIPMENT_FIELDS)
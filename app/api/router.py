@@ -1,14 +1,62 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import ServiceDep
-from app.api.schemas.shipment import ShipmentCreate, ShipmentRead, ShipmentUpdate
-from app.database.models import Shipment
+from app.api.responses import NegotiatedRoute, representation_etag, respond, shipment_full, shipment_read
+from app.api.schemas.shipment import (
+    ShipmentBulkDelete,
+    ShipmentCreate,
+    ShipmentPage,
+    ShipmentRead,
+    ShipmentStats,
+    ShipmentUpdate,
+)
+from app.database.models import Shipment, ShipmentStatus
+from app.services.export import (
+    ARROW_STREAM_MEDIA_TYPE,
+    arrow_stream_chunks,
+    csv_chunks,
+    ndjson_chunks,
+    require_pyarrow,
+    stream_shipments,
+)
+
+router = APIRouter(prefix='/shipment', tags=['Shipment'], route_class=NegotiatedRoute)
+
+
+def version_headers(id: int, updated_at: datetime) -> dict[str, str]:
+    return {
+        "ETag": representation_etag(f"{id}-{int(updated_at.timestamp() * 1_000_000)}"),
+        "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), usegmt=True),
+    }
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
-router = APIRouter(prefix='/shipment', tags=['Shipment'])
 
 ###  a shipment by id
 @router.get("/", response_model=ShipmentRead)
-async def get_shipment(id: int, service: ServiceDep):
+async def get_shipment(
+    id: int,
+    service: ServiceDep,
+    request: Request,
+):
+    ### Conditional GET, answer 304 from the version alone when the client is up to date
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        updated_at = await service.get_updated_at(id)
+        if updated_at is not None:
+            headers = version_headers(id, updated_at)
+            if etag_matches(if_none_match, headers["ETag"]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     shipment = await service.get(id)
     if shipment is None:
         raise HTTPException(
@@ -16,13 +64,114 @@ async def get_shipment(id: int, service: ServiceDep):
             detail="Given id doesn't exist!",
         )
 
-    return shipment
+    return respond(
+        shipment_read(shipment),
+        headers=version_headers(id, shipment.updated_at),
+    )
+
+
+### List shipments page by page, pass back next_cursor to get the next page
+@router.get("/list", response_model=ShipmentPage)
+async def list_shipments(
+    service: ServiceDep,
+    status_: ShipmentStatus | None = Query(default=None, alias="status"),
+    destination: int | None = None,
+    delivery_from: datetime | None = None,
+    delivery_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    try:
+        shipments, next_cursor = await service.get_page(
+            limit,
+            cursor,
+            status=status_,
+            destination=destination,
+            delivery_from=delivery_from,
+            delivery_to=delivery_to,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    return respond({
+        "items": [shipment_read(shipment) for shipment in shipments],
+        "next_cursor": next_cursor,
+    })
+
+
+### Counts and weight totals by status, destination and delivery day
+@router.get("/stats", response_model=ShipmentStats)
+async def get_shipment_stats(service: ServiceDep):
+    return respond(await service.stats())
+
+
+### Stream every shipment matching the list filters as NDJSON, CSV or an Arrow stream
+@router.get("/export")
+async def export_shipments(
+    status_: ShipmentStatus | None = Query(default=None, alias="status"),
+    destination: int | None = None,
+    delivery_from: datetime | None = None,
+    delivery_to: datetime | None = None,
+    format: Literal["ndjson", "csv", "arrow"] = "ndjson",
+):
+    if format == "arrow":
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail=str(e),
+            )
+
+    batches = stream_shipments(
+        status=status_,
+        destination=destination,
+        delivery_from=delivery_from,
+        delivery_to=delivery_to,
+    )
+
+    if format == "arrow":
+        return StreamingResponse(
+            arrow_stream_chunks(batches),
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="shipments.arrows"'},
+        )
+
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(batches),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="shipments.csv"'},
+        )
+
+    return StreamingResponse(
+        ndjson_chunks(batches),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="shipments.ndjson"'},
+    )
 
 
 ### Create a new shipment with content and weight
-@router.post("/")
-async def submit_shipment(shipment: ShipmentCreate, service: ServiceDep) -> Shipment:
-    return await service.add(shipment)
+@router.post("/", response_model=Shipment)
+async def submit_shipment(shipment: ShipmentCreate, service: ServiceDep):
+    return respond(shipment_full(await service.add(shipment)))
+
+
+### Create many shipments in a single transaction
+@router.post("/bulk", response_model=list[ShipmentRead])
+async def submit_shipments(shipments: list[ShipmentCreate], service: ServiceDep):
+    if not shipments:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No shipments provided'
+        )
+
+    return respond(
+        [shipment_read(shipment) for shipment in await service.add_many(shipments)]
+    )
 
 
 ### Update fields of a shipment
@@ -37,14 +186,39 @@ async def update_shipment(id: int, shipment_update: ShipmentUpdate, service: Ser
         )
     
     shipment = await service.update(id, update)
+    if shipment is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Given id doesn't exist!",
+        )
 
-    return shipment
+    return respond(shipment_read(shipment))
 
 
 ### Delete a shipment by id
 @router.delete("/")
 async def delete_shipment(id: int, service: ServiceDep) -> dict[str, str]:
 
-    await service.delete(id)
+    if not await service.delete(id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Given id doesn't exist!",
+        )
+
+    return {"detail": f"Shipment with id #{id} is deleted!"}
+
+
+### Delete many shipments by ids and/or a status/date filter
+@router.delete("/bulk")
+async def delete_shipments(filters: ShipmentBulkDelete, service: ServiceDep) -> dict[str, str | int]:
+    filter_values = filters.model_dump(exclude_none=True)
+
+    if not filter_values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No filter provided, refusing to delete every shipment'
+        )
+
+    deleted = await service.delete_many(**filter_values)
 
-    return {"detail": f"Shipment with id #{id} is deleted!"}
\ No newline at end of file
+    return {"detail": f"{deleted} shipments deleted!", "deleted": deleted}
\ No newline at end of file
@@ -14,6 +14,11 @@ class ShipmentRead(BaseShipment):
     estimated_delivery: datetime
 
 
+class ShipmentPage(BaseModel):
+    items: list[ShipmentRead]
+    next_cursor: str | None = None
+
+
 class ShipmentCreate(BaseShipment):
     pass
     
@@ -23,4 +28,22 @@ class ShipmentUpdate(BaseModel):
     weight: float | None = Field(default=None, le=25)
     # destination: int | None = Field(default=None)
     status: ShipmentStatus | None = Field(default=None)
-    estimated_delivery: datetime | None = Field(default=None)
\ No newline at end of file
+    estimated_delivery: datetime | None = Field(default=None)
+
+
+class ShipmentBulkDelete(BaseModel):
+    ids: list[int] | None = Field(default=None)
+    status: ShipmentStatus | None = Field(default=None)
+    estimated_delivery_before: datetime | None = Field(default=None)
+
+
+class RollupValue(BaseModel):
+    count: int
+    total_weight: float
+
+
+class ShipmentStats(BaseModel):
+    total: RollupValue
+    by_status: dict[str, RollupValue]
+    by_destination: dict[str, RollupValue]
+    by_delivery_day: dict[str, RollupValue]
\ No newline at end of file
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import sys
+
+from app.database import migrations
+from app.database.models import ShipmentStatus
+from app.database.session import get_engine
+from app.services import cache_server
+from app.services.export import stream_shipments, write_columnar
+from app.services.ingest import ingest_shipments, read_rows
+from app.services.stats import reconcile_rollup
+
+
+def ingest(args: argparse.Namespace) -> int:
+    report = asyncio.run(
+        ingest_shipments(read_rows(args.path, args.format), args.batch_size)
+    )
+
+    for failure in report.failures:
+        print(f"line {failure.line}: {failure.error}", file=sys.stderr)
+
+    print(
+        f"Inserted {report.inserted} shipments, {report.failed} failed, "
+        f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)"
+    )
+    return 1 if report.failed else 0
+
+
+def export(args: argparse.Namespace) -> int:
+    batches = stream_shipments(
+        batch_size=args.batch_size,
+        status=args.status,
+        destination=args.destination,
+    )
+    rows = asyncio.run(write_columnar(args.path, args.format, batches))
+
+    print(f"Exported {rows} shipments to {args.path}")
+    return 0
+
+
+def serve_cache(args: argparse.Namespace) -> int:
+    print(f"Cache server listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(cache_server.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def migrate(args: argparse.Namespace) -> int:
+    async def run() -> list[migrations.Migration]:
+        try:
+            applied = await migrations.migrate(get_engine(), args.to)
+            ### Tables that existed before migrations may hold rows the rollup never counted
+            if applied:
+                await reconcile_rollup(get_engine())
+            return applied
+        finally:
+            await get_engine().dispose()
+
+    applied = asyncio.run(run())
+    for migration in applied:
+        print(f"Applied {migration.version:03d} {migration.description}")
+    if not applied:
+        print("Schema is up to date")
+    return 0
+
+
+def build_docs(args: argparse.Namespace) -> int:
+    ### Only this command needs the app itself
+    from app.docs import write_artifact
+    from app.main import app
+
+    for path in write_artifact(app, args.directory):
+        print(f"Wrote {path} ({path.stat().st_size} bytes)")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ### Bulk load shipments from a file
+    ingest_parser = commands.add_parser("ingest", help="COPY shipments from an NDJSON or CSV file")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+    ingest_parser.add_argument("--batch-size", type=int, default=None)
+    ingest_parser.set_defaults(handler=ingest)
+
+    ### Columnar export for analytics
+    export_parser = commands.add_parser("export", help="Export shipments to Parquet or Arrow IPC")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    export_parser.add_argument("--batch-size", type=int, default=None, help="Rows per row group / record batch")
+    export_parser.add_argument("--status", choices=[status.value for status in ShipmentStatus], default=None)
+    export_parser.add_argument("--destination", type=int, default=None)
+    export_parser.set_defaults(handler=export)
+
+    ### Schema migrations, run once per deploy before the app starts
+    migrate_parser = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrate_parser.add_argument("--to", type=int, default=None, help="Stop at this version")
+    migrate_parser.set_defaults(handler=migrate)
+
+    ### Prebuilt docs, point DOCS_ARTIFACT_DIR at the directory to skip rendering at startup
+    docs_parser = commands.add_parser("build-docs", help="Render the OpenAPI document and docs pages")
+    docs_parser.add_argument("directory")
+    docs_parser.set_defaults(handler=build_docs)
+
+    ### Local stand-in for the shared cache server
+    cache_parser = commands.add_parser("cache-server", help="Run the local shared cache server")
+    cache_parser.add_argument("--host", default="127.0.0.1")
+    cache_parser.add_argument("--port", type=int, default=6390)
+    cache_parser.set_defaults(handler=serve_cache)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import cast
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class DatabaseSettings(BaseSettings):
@@ -7,6 +10,70 @@ class DatabaseSettings(BaseSettings):
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DATABASE: str
 
+    ### Full SQLAlchemy URL that replaces the Postgres one, e.g. a SQLite file for benchmarks
+    DATABASE_URL: str = ""
+
+    ### Connection pool, sized per deployment to the number of workers
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    ### A ping on every checkout is an extra round trip per request, recycling covers idle timeouts
+    DB_POOL_PRE_PING: bool = False
+    DB_ECHO: bool = False
+
+    ### Refuse to start when migrations are pending, off skips the query at boot
+    SCHEMA_CHECK_ENABLED: bool = True
+
+    ### Max rows per multi-row INSERT statement on bulk endpoints
+    BULK_INSERT_CHUNK_SIZE: int = 500
+
+    ### Rows validated and sent per COPY during bulk ingestion
+    INGEST_BATCH_SIZE: int = 10_000
+
+    ### Rows fetched per round trip from the server-side cursor when exporting
+    EXPORT_BATCH_SIZE: int = 1_000
+
+    ### Seconds between stats rollup reconciliations, 0 turns the job off. Every worker
+    ### schedules it, on PostgreSQL an advisory lock lets only one of them run each round
+    ROLLUP_RECONCILE_SECONDS: float = 3600
+
+    ### Per-request SQL instrumentation, warn above this many queries (0 never warns)
+    QUERY_STATS_ENABLED: bool = True
+    QUERY_COUNT_WARN_THRESHOLD: int = 10
+
+    ### Read-through cache for shipment lookups by id. Off by default: the "memory"
+    ### backend is per process, so with several workers turn it on with "remote" only
+    CACHE_ENABLED: bool = False
+    CACHE_MAX_SIZE: int = 10_000
+    CACHE_TTL_SECONDS: float = 30
+    ### "memory" keeps the cache per process, "remote" shares it between workers
+    CACHE_BACKEND: str = "memory"
+    CACHE_SERVER: str = "localhost"
+    CACHE_PORT: int = 6390
+    ### Bound on each round trip to the cache server, a slower one counts as a miss
+    CACHE_TIMEOUT_SECONDS: float = 0.25
+
+    ### Record a sampled fraction of requests as JSONL for benchmarks/replay.py
+    REQUEST_CAPTURE_ENABLED: bool = False
+    REQUEST_CAPTURE_SAMPLE_RATE: float = 0.01
+    REQUEST_CAPTURE_PATH: str = "./request_capture.jsonl"
+
+    ### Sampling profiler at POST /debug/profile, requests must send PROFILING_TOKEN in X-Profiling-Token
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_MAX_SECONDS: float = 60
+
+    ### Request tracing, a sampled fraction of requests is exported as spans
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.01
+    ### "console", "file" or a "module:attribute" factory returning a SpanExporter
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE_PATH: str = "./traces.jsonl"
+
+    ### Directory written by `python -m app.cli build-docs`, empty renders the docs at startup
+    DOCS_ARTIFACT_DIR: str = ""
+
     model_config = SettingsConfigDict(
         env_file='./.env',
         env_ignore_empty=True,
@@ -17,7 +84,21 @@ class DatabaseSettings(BaseSettings):
     def POSTGRES_URL(self):
         return f"postgresql+asyncpg://{self.POSTGRES_USERNAME}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DATABASE}"
 
-settings = DatabaseSettings()
+    @property
+    def DATABASE_ENGINE_URL(self):
+        return self.DATABASE_URL or self.POSTGRES_URL
+
+
+@lru_cache
+def get_settings() -> DatabaseSettings:
+    return DatabaseSettings()
+
+
+class _LazySettings:
+    """Reads the environment on first attribute access rather than at import."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
 
 
-print(settings.POSTGRES_URL)
\ No newline at end of file
+settings = cast(DatabaseSettings, _LazySettings())
@@ -0,0 +1,127 @@
+"""
+Versioned schema migrations. Each vNNN_<name>.py module in this package
+has an upgrade(connection) function run with a sync Connection inside
+its own transaction, and applied versions are recorded in schema_version.
+On PostgreSQL the whole run holds an advisory lock.
+Migrations run from `python -m app.cli migrate`; app startup only checks
+the recorded version.
+"""
+import importlib
+import pkgutil
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from types import ModuleType
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+### Held from reading schema_version until the last migration is applied, so concurrent runs apply each one once
+ADVISORY_LOCK_KEY = 7_202_301
+ADVISORY_LOCKS = {
+    "postgresql": ("SELECT pg_advisory_lock(:key)", "SELECT pg_advisory_unlock(:key)"),
+}
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    module: ModuleType
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = re.fullmatch(r"v(\d+)_(\w+)", module_info.name)
+        if match is None:
+            continue
+        module = importlib.import_module(f"{__name__}.{module_info.name}")
+        description = (module.__doc__ or match[2]).strip().splitlines()[0]
+        migrations.append(Migration(int(match[1]), description, module))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def latest_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].version if migrations else 0
+
+
+def _current_version(connection: Connection) -> int:
+    schema_version.create(connection, checkfirst=True)
+    return connection.scalar(select(func.coalesce(func.max(schema_version.c.version), 0)))
+
+
+def _apply(connection: Connection, migration: Migration) -> None:
+    migration.module.upgrade(connection)
+    connection.execute(
+        insert(schema_version).values(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.now(),
+        )
+    )
+
+
+def _migrate(connection: Connection, target: int | None) -> list[Migration]:
+    lock, unlock = ADVISORY_LOCKS.get(connection.dialect.name, (None, None))
+    if lock:
+        ### A session lock, it has to outlive the transaction of each migration
+        connection.execute(text(lock), {"key": ADVISORY_LOCK_KEY})
+        connection.commit()
+
+    try:
+        current = _current_version(connection)
+        connection.commit()
+
+        applied = []
+        for migration in load_migrations():
+            if migration.version <= current or (target is not None and migration.version > target):
+                continue
+            with connection.begin():
+                _apply(connection, migration)
+            applied.append(migration)
+        return applied
+    finally:
+        if unlock:
+            connection.rollback()
+            connection.execute(text(unlock), {"key": ADVISORY_LOCK_KEY})
+            connection.commit()
+
+
+async def migrate(engine: AsyncEngine, target: int | None = None) -> list[Migration]:
+    """Applies pending migrations up to target (all by default), returns the ones applied."""
+    async with engine.connect() as connection:
+        return await connection.run_sync(_migrate, target)
+
+
+async def current_version(engine: AsyncEngine) -> int:
+    """One query, 0 when the schema_version table doesn't exist yet."""
+    async with engine.connect() as connection:
+        try:
+            return await connection.scalar(
+                select(func.coalesce(func.max(schema_version.c.version), 0))
+            )
+        except DBAPIError:
+            return 0
+
+
+async def check_schema_version(engine: AsyncEngine) -> None:
+    current, latest = await current_version(engine), latest_version()
+    ### A newer schema is fine, migrations keep old code working during rollouts
+    if current < latest:
+        raise RuntimeError(
+            f"Database schema is at version {current} but this code needs {latest}, "
+            "run `python -m app.cli migrate` first"
+        )
@@ -0,0 +1,61 @@
+"""Shipment and shipment_rollup tables with their indexes"""
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, Enum, Float, Index, Integer, MetaData, String, Table, inspect, text, update,
+)
+from sqlalchemy.engine import Connection
+
+### Snapshot of the schema at this version, later model changes get their own migration
+metadata = MetaData()
+
+shipment = Table(
+    "shipment",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("content", String, nullable=False),
+    Column("weight", Float, nullable=False),
+    Column("destination", Integer, nullable=False),
+    Column(
+        "status",
+        Enum("placed", "in_transit", "out_for_delivery", "delivered", name="shipmentstatus"),
+        nullable=False,
+    ),
+    Column("estimated_delivery", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_shipment_destination", "destination"),
+    Index("ix_shipment_status_estimated_delivery", "status", "estimated_delivery"),
+    Index(
+        "ix_shipment_undelivered_estimated_delivery",
+        "estimated_delivery",
+        "id",
+        postgresql_where=text("status <> 'delivered'"),
+        sqlite_where=text("status <> 'delivered'"),
+    ),
+)
+
+shipment_rollup = Table(
+    "shipment_rollup",
+    metadata,
+    Column("dimension", String, primary_key=True),
+    Column("key", String, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("total_weight", Float, nullable=False),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    ### Databases made by the old create_all at startup may already have the
+    ### tables, possibly from before updated_at existed
+    existing = inspect(connection)
+    if existing.has_table("shipment"):
+        columns = {column["name"] for column in existing.get_columns("shipment")}
+        if "updated_at" not in columns:
+            connection.execute(text("ALTER TABLE shipment ADD COLUMN updated_at TIMESTAMP"))
+            connection.execute(update(shipment).values(updated_at=datetime.now()))
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("ALTER TABLE shipment ALTER COLUMN updated_at SET NOT NULL"))
+
+    metadata.create_all(connection, checkfirst=True)
+    for index in shipment.indexes:
+        index.create(connection, checkfirst=True)
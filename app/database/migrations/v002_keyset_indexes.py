@@ -0,0 +1,20 @@
+"""Indexes matching the list endpoint's (estimated_delivery, id) keyset order"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+shipment = Table(
+    "shipment",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("destination", Integer),
+    Column("estimated_delivery", DateTime),
+    Index("ix_shipment_estimated_delivery_id", "estimated_delivery", "id"),
+    Index("ix_shipment_destination_estimated_delivery_id", "destination", "estimated_delivery", "id"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    for index in shipment.indexes:
+        index.create(connection, checkfirst=True)
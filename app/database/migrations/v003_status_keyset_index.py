@@ -0,0 +1,24 @@
+"""Status index with the keyset's id tiebreaker, drop the redundant destination index"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, text
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+shipment = Table(
+    "shipment",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("status", String),
+    Column("estimated_delivery", DateTime),
+    Index("ix_shipment_status_estimated_delivery_id", "status", "estimated_delivery", "id"),
+)
+
+### Superseded by the index above, and ix_shipment_destination is a prefix of ix_shipment_destination_estimated_delivery_id
+DROPPED_INDEXES = ("ix_shipment_status_estimated_delivery", "ix_shipment_destination")
+
+
+def upgrade(connection: Connection) -> None:
+    for index in shipment.indexes:
+        index.create(connection, checkfirst=True)
+    for name in DROPPED_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
 class ShipmentStatus(str, Enum):
@@ -13,10 +14,36 @@ class ShipmentStatus(str, Enum):
 class Shipment(SQLModel, table=True):
 
     __tablename__ = 'shipment'
+    __table_args__ = (
+        ### Keyset order of the list endpoint, unfiltered, by status and by destination
+        Index('ix_shipment_estimated_delivery_id', 'estimated_delivery', 'id'),
+        Index('ix_shipment_status_estimated_delivery_id', 'status', 'estimated_delivery', 'id'),
+        Index('ix_shipment_destination_estimated_delivery_id', 'destination', 'estimated_delivery', 'id'),
+        ### Only open shipments are tracked and paged through, delivered ones stay out
+        Index(
+            'ix_shipment_undelivered_estimated_delivery',
+            'estimated_delivery',
+            'id',
+            postgresql_where=text("status <> 'delivered'"),
+            sqlite_where=text("status <> 'delivered'"),
+        ),
+    )
 
     id: int = Field(default=None, primary_key=True)
     content: str
     weight: float = Field(le=25)
     destination: int
     status: ShipmentStatus
-    estimated_delivery: datetime
\ No newline at end of file
+    estimated_delivery: datetime
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class ShipmentRollup(SQLModel, table=True):
+
+    __tablename__ = 'shipment_rollup'
+
+    ### dimension is "status", "destination" or "delivery_day", key is its value
+    dimension: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    count: int = 0
+    total_weight: float = 0
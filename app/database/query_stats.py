@@ -0,0 +1,52 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+
+
+### Set by QueryStatsMiddleware for the duration of a request
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def statement_rows(cursor) -> int:
+    """Rows a statement returned, or affected when it returns none."""
+    if cursor.description is not None:
+        ### The asyncpg and aiosqlite adapters buffer the whole result during execute, where rowcount is -1
+        return len(getattr(cursor, "_rows", ()))
+    return max(cursor.rowcount, 0)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = current_query_stats.get()
+    if stats is None:
+        return
+
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started
+    stats.rows += statement_rows(cursor)
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
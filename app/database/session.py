@@ -1,27 +1,45 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine, AsyncSession
 
 from app.config import settings
+from app.database.query_stats import instrument_engine
+from app.tracing import trace_engine
+
 
-engine = create_async_engine(
-    url=settings.POSTGRES_URL,
-    echo=True
-)
+### Created on first use, so importing this module doesn't need the database settings
+@lru_cache
+def get_engine() -> AsyncEngine:
+    engine = create_async_engine(
+        url=settings.DATABASE_ENGINE_URL,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
 
-async def create_db_tables():
-    async with engine.begin() as connection:
-        from app.database.models import Shipment  # noqa: F401 | it imports the model so that it's registered in the metadata.
-        await connection.run_sync(SQLModel.metadata.create_all)
+    if settings.QUERY_STATS_ENABLED:
+        instrument_engine(engine)
 
+    if settings.TRACING_ENABLED:
+        trace_engine(engine)
 
-async def get_session():
-    async_session = sessionmaker(
-        bind=engine,
+    return engine
+
+### Built once per process and shared by every request
+@lru_cache
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=get_engine(),
         class_=AsyncSession,
-        expire_on_commit=False 
+        expire_on_commit=False
     )
 
+def async_session() -> AsyncSession:
+    return get_sessionmaker()()
+
+async def get_session():
     async with async_session() as session:
         yield session
-
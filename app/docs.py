@@ -0,0 +1,138 @@
+"""
+API docs served from bytes built once: the OpenAPI document and the
+Scalar, Swagger UI and ReDoc pages are rendered at startup (or loaded
+from a directory written by `python -m app.cli build-docs`), compressed
+ahead of time and given strong ETags, so a docs request is a dict lookup
+and a conditional 304.
+"""
+import gzip
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import orjson
+from fastapi import FastAPI, Request, Response, status
+
+from app.api.router import etag_matches
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+OPENAPI_URL = "/openapi.json"
+
+MEDIA_TYPES = {
+    "openapi.json": "application/json",
+    "scalar.html": "text/html; charset=utf-8",
+    "swagger.html": "text/html; charset=utf-8",
+    "redoc.html": "text/html; charset=utf-8",
+}
+
+### Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass
+class DocsAsset:
+    media_type: str
+    etag: str
+    ### Body per content coding, "identity" always present
+    bodies: dict[str, bytes] = field(default_factory=dict)
+
+
+def compress(body: bytes) -> dict[str, bytes]:
+    ### mtime=0 keeps the gzip bytes, and so the build artifact, reproducible
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    return bodies
+
+
+def make_asset(name: str, body: bytes, bodies: dict[str, bytes] | None = None) -> DocsAsset:
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return DocsAsset(MEDIA_TYPES[name], digest, bodies or compress(body))
+
+
+def render(app: FastAPI) -> dict[str, bytes]:
+    from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+    from scalar_fastapi import get_scalar_api_reference
+
+    return {
+        "openapi.json": orjson.dumps(app.openapi()),
+        "scalar.html": get_scalar_api_reference(openapi_url=OPENAPI_URL, title="Scalar API").body,
+        "swagger.html": get_swagger_ui_html(openapi_url=OPENAPI_URL, title=f"{app.title} - Swagger UI").body,
+        "redoc.html": get_redoc_html(openapi_url=OPENAPI_URL, title=f"{app.title} - ReDoc").body,
+    }
+
+
+def write_artifact(app: FastAPI, directory: str | Path) -> list[Path]:
+    """Writes every page with its precompressed variants, for DOCS_ARTIFACT_DIR."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, body in render(app).items():
+        for encoding, encoded in compress(body).items():
+            path = directory / (name + SUFFIXES.get(encoding, ""))
+            path.write_bytes(encoded)
+            written.append(path)
+    return written
+
+
+def load_artifact(directory: str | Path) -> dict[str, DocsAsset]:
+    directory = Path(directory)
+    assets = {}
+    for name in MEDIA_TYPES:
+        body = (directory / name).read_bytes()
+        bodies = {"identity": body}
+        for encoding, suffix in SUFFIXES.items():
+            path = directory / (name + suffix)
+            if path.exists():
+                bodies[encoding] = path.read_bytes()
+        ### An artifact built without Brotli still gets gzip
+        if "gzip" not in bodies:
+            bodies["gzip"] = compress(body)["gzip"]
+        assets[name] = make_asset(name, body, bodies)
+    return assets
+
+
+### Filled by prepare_docs() in the lifespan
+assets: dict[str, DocsAsset] = {}
+
+
+def prepare_docs(app: FastAPI) -> None:
+    if settings.DOCS_ARTIFACT_DIR:
+        assets.update(load_artifact(settings.DOCS_ARTIFACT_DIR))
+    else:
+        assets.update({name: make_asset(name, body) for name, body in render(app).items()})
+
+
+def _accepted(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def docs_response(request: Request, app: FastAPI, name: str) -> Response:
+    if name not in assets:
+        prepare_docs(app)
+    asset = assets[name]
+
+    accepted = _accepted(request.headers.get("accept-encoding", ""))
+    encoding = next((encoding for encoding in ENCODINGS if encoding in asset.bodies and encoding in accepted), "identity")
+
+    ### Strong validators are per representation, so each coding gets its own
+    etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(asset.bodies[encoding], media_type=asset.media_type, headers=headers)
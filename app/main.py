@@ -1,24 +1,105 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from scalar_fastapi import get_scalar_api_reference
+from typing import Literal
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse
+from app.api.responses import ORJSONResponse
+from app.api.dependencies import require_profiling_token
 from app.api.router import router
-from .database.session import create_db_tables
+from . import profiling
+from .docs import OPENAPI_URL, docs_response, prepare_docs
+from .database.migrations import check_schema_version
+from .database.session import get_engine
+from .config import settings
+from .metrics import register_cache_metrics, register_pool_metrics, registry
+from .middleware import MetricsMiddleware, ProfilingMiddleware, QueryStatsMiddleware, RequestCaptureMiddleware, enabled_by
+from .services.cache import get_shipment_cache
+from .services.stats import reconcile_periodically
+from .tracing import shutdown_exporter
 
 
 @asynccontextmanager
 async def lifespan_handler(app: FastAPI):
-    await create_db_tables()
+    if settings.SCHEMA_CHECK_ENABLED:
+        await check_schema_version(get_engine())
+    prepare_docs(app)
+    await get_shipment_cache().start()
+    reconcile_task = None
+    if settings.ROLLUP_RECONCILE_SECONDS > 0:
+        reconcile_task = asyncio.create_task(reconcile_periodically())
     yield
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    await get_shipment_cache().close()
+    shutdown_exporter()
     print('Server stoped')
 
-app = FastAPI(lifespan=lifespan_handler)
+### The OpenAPI document and docs pages are served prebuilt from app.docs
+app = FastAPI(
+    lifespan=lifespan_handler,
+    default_response_class=ORJSONResponse,
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+)
 
 app.include_router(router)
 
-### Scalar API Documentation
+app.add_middleware(enabled_by("QUERY_STATS_ENABLED", QueryStatsMiddleware))
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(enabled_by("REQUEST_CAPTURE_ENABLED", RequestCaptureMiddleware))
+app.add_middleware(enabled_by("PROFILING_ENABLED", ProfilingMiddleware))
+
+register_pool_metrics(lambda: get_engine().pool)
+register_cache_metrics(get_shipment_cache)
+
+### Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+### Sampling profiler, everything in the window or a fraction of requests (404 unless PROFILING_ENABLED)
+@app.post("/debug/profile", include_in_schema=False, dependencies=[Depends(require_profiling_token)])
+async def profile(
+    seconds: float = Query(default=10, gt=0),
+    request_sample_rate: float | None = Query(default=None, gt=0, le=1),
+    interval_ms: float = Query(default=5, ge=1, le=1000),
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+):
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles are limited to {settings.PROFILING_MAX_SECONDS:g} seconds",
+        )
+    if profiling.active_sampler is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+
+    sampler = profiling.StackSampler(interval_ms / 1000, request_sample_rate)
+    profiling.active_sampler = sampler
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiling.active_sampler = None
+        sampler.stop()
+
+    if format == "speedscope":
+        return ORJSONResponse(sampler.speedscope())
+    return PlainTextResponse(sampler.collapsed())
+
+### OpenAPI document and API documentation pages
+@app.get(OPENAPI_URL, include_in_schema=False)
+async def get_openapi(request: Request):
+    return docs_response(request, app, "openapi.json")
+
+@app.get("/docs", include_in_schema=False)
+async def get_swagger_docs(request: Request):
+    return docs_response(request, app, "swagger.html")
+
+@app.get("/redoc", include_in_schema=False)
+async def get_redoc_docs(request: Request):
+    return docs_response(request, app, "redoc.html")
+
 @app.get("/scalar", include_in_schema=False)
-def get_scalar_docs():
-    return get_scalar_api_reference(
-        openapi_url=app.openapi_url,
-        title="Scalar API",
-    )
+async def get_scalar_docs(request: Request):
+    return docs_response(request, app, "scalar.html")
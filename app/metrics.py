@@ -0,0 +1,142 @@
+"""
+Small Prometheus-compatible metrics registry. Recording is a couple of
+dict lookups and integer adds on the event loop thread, no locks needed.
+"""
+from bisect import bisect_left
+from typing import Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.label_names, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackMetric:
+    """Value read at scrape time, for numbers owned by something else (DB pool, cache)."""
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float], type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.type = type
+
+    def samples(self) -> list[str]:
+        return [f"{self.name} {self.callback()}"]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        ### labels -> [per-bucket counts (last one is +Inf), sum]
+        self.values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                label_text = _labels((*self.label_names, "le"), (*labels, str(bound)))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route", labels=("route", "method"),
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled",
+))
+request_errors = registry.register(Counter(
+    "http_request_errors_total", "Responses with a 4xx/5xx status or unhandled errors", labels=("route", "status"),
+))
+
+
+### Both take getters, the pool and the cache are only built when first used
+
+def register_pool_metrics(get_pool: Callable) -> None:
+    registry.register(CallbackMetric(
+        "db_pool_checked_out", "Connections currently checked out of the pool", lambda: get_pool().checkedout(),
+    ))
+    registry.register(CallbackMetric(
+        "db_pool_overflow", "Connections open beyond pool_size", lambda: max(get_pool().overflow(), 0),
+    ))
+
+
+def register_cache_metrics(get_cache: Callable) -> None:
+    def hit_ratio() -> float:
+        cache = get_cache()
+        lookups = cache.hits + cache.misses
+        return cache.hits / lookups if lookups else 0.0
+
+    registry.register(CallbackMetric(
+        "cache_hits_total", "Shipment cache hits", lambda: get_cache().hits, type="counter",
+    ))
+    registry.register(CallbackMetric(
+        "cache_misses_total", "Shipment cache misses", lambda: get_cache().misses, type="counter",
+    ))
+    registry.register(CallbackMetric("cache_hit_ratio", "Shipment cache hits over lookups", hit_ratio))
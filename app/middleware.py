@@ -0,0 +1,214 @@
+import base64
+import logging
+import random
+import sys
+import time
+from typing import IO, Callable
+
+import orjson
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import profiling
+from app.config import settings
+from app.database.query_stats import QueryStats, current_query_stats
+from app.metrics import request_errors, request_latency, requests_in_flight
+
+logger = logging.getLogger("app.requests")
+
+
+def enabled_by(setting: str, middleware: Callable[[ASGIApp], ASGIApp]) -> Callable[[ASGIApp], ASGIApp]:
+    """
+    Adds middleware only when the setting is on. Starlette builds the stack
+    on the first ASGI call, so settings aren't read when app.main is imported.
+    """
+
+    def build(app: ASGIApp) -> ASGIApp:
+        return middleware(app) if getattr(settings, setting) else app
+
+    return build
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the SQL statements, DB time and rows of each request. They are
+    sent back in a Server-Timing header, logged as structured fields and a
+    warning is logged past QUERY_COUNT_WARN_THRESHOLD (a likely N+1).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                server_timing = (
+                    f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries, {stats.rows} rows"'
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            self._log(scope, stats)
+
+    def _log(self, scope: Scope, stats: QueryStats) -> None:
+        threshold = settings.QUERY_COUNT_WARN_THRESHOLD
+        over_threshold = threshold and stats.count > threshold
+        if not over_threshold and not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "db_queries": stats.count,
+            "db_time_ms": round(stats.seconds * 1000, 2),
+            "db_rows": stats.rows,
+        }
+        if over_threshold:
+            logger.warning(
+                "%s %s ran %d queries (threshold %d), possible N+1",
+                scope["method"], scope["path"], stats.count, threshold,
+                extra=fields,
+            )
+        else:
+            logger.debug("%s %s ran %d queries", scope["method"], scope["path"], stats.count, extra=fields)
+
+
+class MetricsMiddleware:
+    """Records latency per route, requests in flight and error responses."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec()
+
+            ### Routing fills in the endpoint, unmatched paths share one label
+            route = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            request_latency.observe(elapsed, route, scope["method"])
+            if status_code >= 400:
+                request_errors.inc(route, str(status_code))
+
+
+class RequestCaptureMiddleware:
+    """
+    Appends a sampled fraction of requests to a JSONL file: method, path,
+    query, body, the headers that change the response, status and server
+    side duration. benchmarks/replay.py re-issues them.
+    """
+
+    HEADERS = (b"content-type", b"accept")
+
+    def __init__(self, app: ASGIApp, path: str | None = None, sample_rate: float | None = None):
+        self.app = app
+        self.path = path or settings.REQUEST_CAPTURE_PATH
+        self.sample_rate = settings.REQUEST_CAPTURE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.file: IO[bytes] | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status_code = 500
+
+        async def receive_and_keep() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        timestamp = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_keep, send_with_status)
+        finally:
+            self._write({
+                "ts": timestamp,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "headers": {
+                    name.decode(): value.decode("latin-1")
+                    for name, value in scope["headers"]
+                    if name in self.HEADERS
+                },
+                **self._body(bytes(body)),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
+
+    @staticmethod
+    def _body(body: bytes) -> dict:
+        try:
+            return {"body": body.decode()}
+        except UnicodeDecodeError:
+            return {"body_base64": base64.b64encode(body).decode()}
+
+    def _write(self, record: dict) -> None:
+        ### One write per line in append mode, so workers sharing the file don't interleave lines
+        if self.file is None:
+            self.file = open(self.path, "ab", buffering=0)
+        self.file.write(orjson.dumps(record) + b"\n")
+
+
+class ProfilingMiddleware:
+    """
+    Marks requests picked by a running StackSampler that profiles a
+    fraction of requests. Without one it only costs an attribute lookup.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        sampler = profiling.active_sampler
+        if sampler is None or scope["type"] != "http" or not sampler.wants_request():
+            await self.app(scope, receive, send)
+            return
+
+        ### The sampler counts stacks that pass through this frame
+        frame = sys._getframe()
+        sampler.requests.add(frame)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.requests.discard(frame)
@@ -0,0 +1,104 @@
+"""
+Sampling profiler for production use. A SIGPROF interval timer interrupts
+the process every few milliseconds of CPU time and the handler records the
+event loop's current stack. While a coroutine runs its awaiting callers
+are on that stack too, so samples show the route handler, ShipmentService
+and SQLAlchemy frames together. Output is collapsed stacks (flamegraph.pl,
+speedscope, inferno) or speedscope JSON.
+
+Signals rather than a sampling thread: a thread only gets the GIL when the
+loop releases it, which is nearly always inside select(), so it would
+report an idle server. Python runs signal handlers on the main thread,
+which is where uvicorn runs the event loop.
+"""
+import random
+import signal
+import time
+from collections import Counter
+from types import CodeType, FrameType
+
+### The running sampler, ProfilingMiddleware reads it on every request
+active_sampler: "StackSampler | None" = None
+
+
+def _frame_name(code: CodeType, module: str) -> str:
+    return f"{module}.{code.co_qualname}".replace(";", ":").replace(" ", "_")
+
+
+class StackSampler:
+    """
+    Samples the main thread's stack every `interval` seconds of process CPU
+    time. With request_sample_rate set only samples taken inside a sampled
+    request count, otherwise everything in the window counts.
+    """
+
+    def __init__(self, interval: float, request_sample_rate: float | None = None):
+        self.interval = interval
+        self.request_sample_rate = request_sample_rate
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.requests: set[FrameType] = set()
+        self.started = 0.0
+        self.seconds = 0.0
+        self._names: dict[CodeType, str] = {}
+        self._previous_handler = None
+
+    def wants_request(self) -> bool:
+        return self.request_sample_rate is not None and random.random() < self.request_sample_rate
+
+    def start(self) -> None:
+        ### Raises ValueError off the main thread
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        self.started = time.perf_counter()
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.seconds = time.perf_counter() - self.started
+
+    def _sample(self, signum: int, frame: FrameType | None) -> None:
+        self.samples += 1
+        if frame is not None:
+            self._record(frame)
+
+    def _record(self, frame: FrameType | None) -> None:
+        stack = []
+        in_request = self.request_sample_rate is None
+        while frame is not None:
+            in_request = in_request or frame in self.requests
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = _frame_name(code, frame.f_globals.get("__name__", "?"))
+            stack.append(name)
+            frame = frame.f_back
+        if in_request:
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str = "shipment api") -> dict:
+        frames: dict[str, int] = {}
+        samples = []
+        weights = []
+        interval_ms = self.interval * 1000
+        for stack, count in self.stacks.most_common():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * interval_ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "app.profiling",
+        }
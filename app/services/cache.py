@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable
+
+from app.config import settings
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded in-process cache with LRU eviction and a per-entry TTL."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(ABC):
+    """
+    Cache of JSON-serializable values keyed by string. Read-through fills
+    pass the time their read started to set(), which skips the value when
+    the key was invalidated since: the row read may predate that write.
+    """
+
+    hits = 0
+    misses = 0
+    ### Monotonic time of each recent invalidation, set by subclasses
+    invalidations: LRUCache
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, read_started: float | None = None) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    async def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            await self.delete(key)
+
+    def _invalidate(self, key: str) -> None:
+        self.invalidations.set(key, time.monotonic())
+
+    def _invalidated_since(self, key: str, read_started: float | None) -> bool:
+        if read_started is None:
+            return False
+        invalidated = self.invalidations.get(key)
+        return invalidated is not None and invalidated >= read_started
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process cache, only coherent when running a single worker."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.local = LRUCache(max_size, ttl)
+        self.invalidations = LRUCache(max_size, ttl)
+
+    @property
+    def hits(self) -> int:
+        return self.local.hits
+
+    @property
+    def misses(self) -> int:
+        return self.local.misses
+
+    async def get(self, key: str) -> Any | None:
+        return self.local.get(key)
+
+    async def set(self, key: str, value: Any, read_started: float | None = None) -> None:
+        if not self._invalidated_since(key, read_started):
+            self.local.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self.local.delete(key)
+            self._invalidate(key)
+
+
+### Minimal RESP (Redis protocol) codec, shared with the local cache server
+
+def encode_command(*parts: str | bytes) -> bytes:
+    out = [f"*{len(parts)}\r\n".encode()]
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+class RespError(Exception):
+    pass
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Cache server closed the connection")
+
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length == -1:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length == -1:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RespError(f"Unexpected reply {line!r}")
+
+
+### Raised when the cache server is down, slow or misbehaves, the cache then acts as a miss (TimeoutError is an OSError)
+CACHE_ERRORS = (OSError, asyncio.IncompleteReadError, RespError)
+
+
+class RemoteCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker through a Redis-compatible server, with a
+    small per-process near cache in front of it. Deletes are published on
+    INVALIDATION_CHANNEL so every worker drops its near-cache copy; if the
+    subscription is lost it is reopened and the near cache cleared, since
+    invalidations may have been missed meanwhile. The cache is only an
+    optimization: every exchange with the server is bounded by timeout, and
+    when the server can't be reached errors are logged and lookups fall
+    through to the database.
+    """
+
+    resubscribe_seconds = 5.0
+
+    def __init__(self, host: str, port: int, max_size: int, ttl: float, timeout: float = 0.25):
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.near = LRUCache(max_size, ttl)
+        self.invalidations = LRUCache(max_size, ttl)
+        self.hits = 0
+        self.misses = 0
+        self._connection: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._lock = asyncio.Lock()
+        self._subscriber: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._subscriber = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            self._subscriber = None
+        if self._connection is not None:
+            self._connection[1].close()
+            self._connection = None
+
+    async def _listen(self) -> None:
+        while True:
+            writer = None
+            try:
+                async with asyncio.timeout(self.timeout):
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    writer.write(encode_command("SUBSCRIBE", INVALIDATION_CHANNEL))
+                    await writer.drain()
+                    await read_reply(reader)
+                ### Anything published while unsubscribed was missed
+                self.near.clear()
+                while True:
+                    message = await read_reply(reader)
+                    if isinstance(message, list) and message[0] == b"message":
+                        key = message[2].decode()
+                        self.near.delete(key)
+                        self._invalidate(key)
+            except CACHE_ERRORS as error:
+                logger.warning(
+                    "Cache invalidation subscription lost, resubscribing in %gs: %r", self.resubscribe_seconds, error
+                )
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.resubscribe_seconds)
+
+    async def _pipeline(self, *commands: tuple[str | bytes, ...]) -> list[Any]:
+        """Sends every command in one write and reads the replies in order."""
+        async with asyncio.timeout(self.timeout), self._lock:
+            try:
+                if self._connection is None:
+                    self._connection = await asyncio.open_connection(self.host, self.port)
+                reader, writer = self._connection
+                writer.write(b"".join(encode_command(*parts) for parts in commands))
+                await writer.drain()
+                return [await read_reply(reader) for _ in commands]
+            except BaseException:
+                ### Cancelled or failed midway, an unread reply would be taken as the next command's
+                if self._connection is not None:
+                    self._connection[1].close()
+                    self._connection = None
+                raise
+
+    async def get(self, key: str) -> Any | None:
+        value = self.near.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        try:
+            [data] = await self._pipeline(("GET", key))
+        except CACHE_ERRORS as error:
+            logger.warning("Cache GET failed, reading from the database: %r", error)
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        value = json.loads(data)
+        self.near.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, read_started: float | None = None) -> None:
+        if self._invalidated_since(key, read_started):
+            return
+        self.near.set(key, value)
+        try:
+            await self._pipeline(("SET", key, json.dumps(value), "PX", str(int(self.ttl * 1000))))
+        except CACHE_ERRORS as error:
+            logger.warning("Cache SET failed: %r", error)
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        for key in keys:
+            self.near.delete(key)
+            self._invalidate(key)
+        try:
+            await self._pipeline(
+                ("DEL", *keys),
+                *(("PUBLISH", INVALIDATION_CHANNEL, key) for key in keys),
+            )
+        except CACHE_ERRORS as error:
+            ### Other workers keep their copies until the TTL runs out
+            logger.warning("Cache invalidation of %d keys failed: %r", len(keys), error)
+
+
+@lru_cache
+def get_shipment_cache() -> CacheBackend:
+    if settings.CACHE_BACKEND == "remote":
+        return RemoteCacheBackend(
+            host=settings.CACHE_SERVER,
+            port=settings.CACHE_PORT,
+            max_size=settings.CACHE_MAX_SIZE,
+            ttl=settings.CACHE_TTL_SECONDS,
+            timeout=settings.CACHE_TIMEOUT_SECONDS,
+        )
+
+    return MemoryCacheBackend(
+        max_size=settings.CACHE_MAX_SIZE,
+        ttl=settings.CACHE_TTL_SECONDS,
+    )
+
@@ -0,0 +1,76 @@
+"""
+Local stand-in for the shared cache server. It speaks the subset of the
+Redis protocol that RemoteCacheBackend uses (PING, GET, SET with PX, DEL,
+PUBLISH, SUBSCRIBE), so tests and development don't need a real Redis.
+"""
+import asyncio
+import time
+
+from app.services.cache import RespError, encode_command, read_reply
+
+
+class CacheServer:
+    def __init__(self):
+        self.entries: dict[bytes, tuple[float | None, bytes]] = {}
+        self.subscribers: dict[bytes, set[asyncio.StreamWriter]] = {}
+
+    def _get(self, key: bytes) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and expires < time.monotonic():
+            del self.entries[key]
+            return None
+        return value
+
+    def _execute(self, writer: asyncio.StreamWriter, command: list[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"GET":
+            value = self._get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"SET":
+            expires = None
+            if len(args) == 4 and args[2].upper() == b"PX":
+                expires = time.monotonic() + int(args[3]) / 1000
+            self.entries[args[0]] = (expires, args[1])
+            return b"+OK\r\n"
+        if name == b"DEL":
+            deleted = sum(self.entries.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % deleted
+        if name == b"PUBLISH":
+            receivers = self.subscribers.get(args[0], set())
+            for receiver in receivers:
+                receiver.write(encode_command(b"message", args[0], args[1]))
+            return b":%d\r\n" % len(receivers)
+        if name == b"SUBSCRIBE":
+            self.subscribers.setdefault(args[0], set()).add(writer)
+            return b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (len(args[0]), args[0])
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                command = await read_reply(reader)
+                writer.write(self._execute(writer, command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, RespError):
+            pass
+        finally:
+            for receivers in self.subscribers.values():
+                receivers.discard(writer)
+            writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 6390) -> asyncio.Server:
+    cache_server = CacheServer()
+    return await asyncio.start_server(cache_server.handle, host, port)
+
+
+async def run(host: str = "127.0.0.1", port: int = 6390) -> None:
+    server = await serve(host, port)
+    async with server:
+        await server.serve_forever()
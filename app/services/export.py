@@ -0,0 +1,168 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator
+
+import orjson
+from sqlalchemy import select
+
+from app.config import settings
+from app.database.models import Shipment, ShipmentStatus
+from app.database.session import async_session
+from app.services.shipment import filter_shipments
+
+### Columnar export is optional and pyarrow is slow to import, require_pyarrow() loads it
+pa: Any = None
+pq: Any = None
+
+EXPORT_COLUMNS = tuple(Shipment.model_fields)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+STATUS_INDEX = {status: index for index, status in enumerate(ShipmentStatus)}
+
+
+async def stream_shipments(batch_size: int | None = None, **filters) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Yield batches of shipment rows matching the list filters, read through a
+    server-side cursor so only one batch is held in memory at a time.
+
+    The export outlives the request's dependencies, so it opens its own session.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    statement = (
+        filter_shipments(select(Shipment.__table__), **filters)
+        .order_by(Shipment.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    async with async_session() as session:
+        result = await session.stream(statement)
+        async for rows in result.mappings().partitions(batch_size):
+            yield [dict(row) for row in rows]
+
+
+async def ndjson_chunks(batches: AsyncIterator[list[dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+async def csv_chunks(batches: AsyncIterator[list[dict[str, Any]]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    async for rows in batches:
+        writer.writerows([_csv_value(row[column]) for column in EXPORT_COLUMNS] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+### Columnar (Arrow / Parquet) export
+
+def require_pyarrow() -> None:
+    global pa, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Columnar export needs pyarrow, install it with 'pip install pyarrow'") from None
+    pa, pq = pyarrow, pyarrow.parquet
+
+
+def _arrow_type(annotation: Any) -> "pa.DataType":
+    if annotation is ShipmentStatus:
+        return pa.dictionary(pa.int8(), pa.string())
+    if annotation is datetime:
+        return pa.timestamp("us")
+    if annotation is int:
+        return pa.int64()
+    if annotation is float:
+        return pa.float64()
+    return pa.string()
+
+
+def arrow_schema() -> "pa.Schema":
+    """Arrow schema mapped from the Shipment model, status as a dictionary column and nullability from the table."""
+    require_pyarrow()
+    columns = Shipment.__table__.columns
+    return pa.schema([
+        pa.field(name, _arrow_type(field.annotation), nullable=columns[name].nullable)
+        for name, field in Shipment.model_fields.items()
+    ])
+
+
+def _status_column(values: list[ShipmentStatus]) -> "pa.DictionaryArray":
+    ### Same dictionary for every batch so streams never need a replacement
+    indices = pa.array([STATUS_INDEX[ShipmentStatus(value)] for value in values], type=pa.int8())
+    return pa.DictionaryArray.from_arrays(indices, pa.array([status.value for status in ShipmentStatus]))
+
+
+def to_record_batch(rows: list[dict[str, Any]], schema: "pa.Schema") -> "pa.RecordBatch":
+    columns = [
+        _status_column([row[field.name] for row in rows])
+        if pa.types.is_dictionary(field.type)
+        else pa.array([row[field.name] for row in rows], type=field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+async def arrow_stream_chunks(batches: AsyncIterator[list[dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Encode batches as an Arrow IPC stream, one record batch per chunk."""
+    schema = arrow_schema()
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    yield drain()
+
+    async for rows in batches:
+        writer.write_batch(to_record_batch(rows, schema))
+        yield drain()
+
+    writer.close()
+    yield drain()
+
+
+async def write_columnar(path: str, format: str, batches: AsyncIterator[list[dict[str, Any]]]) -> int:
+    """Write batches to a Parquet file (one row group per batch) or an Arrow IPC file."""
+    schema = arrow_schema()
+    rows_written = 0
+
+    if format == "parquet":
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    try:
+        async for rows in batches:
+            batch = to_record_batch(rows, schema)
+            if format == "parquet":
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            rows_written += len(rows)
+    finally:
+        writer.close()
+
+    return rows_written
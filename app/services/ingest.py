@@ -0,0 +1,120 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from pydantic import ValidationError
+
+from app.api.schemas.shipment import ShipmentCreate
+from app.config import settings
+from app.database.models import ShipmentStatus
+from app.database.session import get_engine
+from app.services.stats import reconcile_rollup
+
+COPY_COLUMNS = ["content", "weight", "destination", "status", "estimated_delivery", "updated_at"]
+
+
+@dataclass
+class IngestFailure:
+    line: int
+    error: str
+
+
+@dataclass
+class IngestReport:
+    inserted: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    failures: list[IngestFailure] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+
+def read_rows(path: str | Path, format: str | None = None) -> Iterator[tuple[int, Any]]:
+    """Yield (line number, raw row) pairs from an NDJSON or CSV file."""
+    path = Path(path)
+    format = format or ("csv" if path.suffix == ".csv" else "ndjson")
+
+    with path.open(newline="") as file:
+        if format == "csv":
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, row
+            return
+
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                yield line, e
+
+
+def _validate(raw: Any, now: datetime, estimated_delivery: datetime) -> tuple:
+    if isinstance(raw, Exception):
+        raise ValueError(f"Invalid JSON: {raw}")
+
+    shipment = ShipmentCreate.model_validate(raw)
+    return (
+        shipment.content,
+        shipment.weight,
+        shipment.destination,
+        ShipmentStatus.placed.name,
+        estimated_delivery,
+        now,
+    )
+
+
+async def ingest_shipments(
+    rows: Iterable[tuple[int, Any]],
+    batch_size: int | None = None,
+) -> IngestReport:
+    """
+    Validate rows in batches and write them to the shipment table with
+    asyncpg's COPY. Invalid rows are reported and skipped, each batch is
+    committed on its own so one bad batch doesn't undo the whole load. The
+    stats rollup is reconciled once the load is done.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    report = IngestReport()
+    started = time.perf_counter()
+    now = datetime.now()
+    estimated_delivery = now + timedelta(days=3)
+
+    async with get_engine().connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        asyncpg_connection = raw_connection.driver_connection
+
+        async def copy(records: list[tuple]) -> None:
+            async with asyncpg_connection.transaction():
+                await asyncpg_connection.copy_records_to_table(
+                    "shipment", records=records, columns=COPY_COLUMNS
+                )
+            report.inserted += len(records)
+
+        records = []
+        for line, raw in rows:
+            try:
+                records.append(_validate(raw, now, estimated_delivery))
+            except (ValidationError, ValueError) as e:
+                report.failed += 1
+                report.failures.append(IngestFailure(line=line, error=str(e)))
+
+            if len(records) >= batch_size:
+                await copy(records)
+                records = []
+
+        if records:
+            await copy(records)
+
+    ### COPY bypasses the incremental rollup updates, rebuild it once at the end
+    if report.inserted:
+        await reconcile_rollup(get_engine())
+
+    report.seconds = time.perf_counter() - started
+    return report
@@ -1,16 +1,113 @@
+import base64
+import json
+import time
 from datetime import datetime, timedelta
-from app.api.schemas.shipment import ShipmentCreate, ShipmentUpdate
+from sqlalchemy import delete, insert, select, tuple_, update
+from app.api.schemas.shipment import ShipmentCreate
+from app.config import settings
 from app.database.models import Shipment, ShipmentStatus
+from app.services.cache import get_shipment_cache
+from app.services.stats import RollupDelta, read_rollup
+from app.tracing import traced
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+def cache_key(id: int) -> str:
+    return f"shipment:{id}"
+
+
+def encode_cursor(shipment: Shipment) -> str:
+    key = [shipment.estimated_delivery.isoformat(), shipment.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        estimated_delivery, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(estimated_delivery), int(id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def filter_shipments(
+    statement,
+    status: ShipmentStatus | None = None,
+    destination: int | None = None,
+    delivery_from: datetime | None = None,
+    delivery_to: datetime | None = None,
+):
+    if status is not None:
+        statement = statement.where(Shipment.status == status)
+    if destination is not None:
+        statement = statement.where(Shipment.destination == destination)
+    if delivery_from is not None:
+        statement = statement.where(Shipment.estimated_delivery >= delivery_from)
+    if delivery_to is not None:
+        statement = statement.where(Shipment.estimated_delivery < delivery_to)
+    return statement
+
+
+def page_statement(limit: int, cursor: str | None = None, **filters):
+    """One keyset page, plus a row to tell whether another page follows."""
+    statement = filter_shipments(select(Shipment), **filters)
+
+    ### Keyset pagination, seek past the last (estimated_delivery, id) seen
+    if cursor is not None:
+        statement = statement.where(
+            tuple_(Shipment.estimated_delivery, Shipment.id) > tuple_(*decode_cursor(cursor))
+        )
+
+    return statement.order_by(Shipment.estimated_delivery, Shipment.id).limit(limit + 1)
+
+
 class ShipmentService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @traced
     async def get(self, id: int) -> Shipment:
-        return await self.session.get(Shipment, id)
+        if not settings.CACHE_ENABLED:
+            return await self.session.get(Shipment, id)
 
+        cached = await get_shipment_cache().get(cache_key(id))
+        if cached is not None:
+            return Shipment.model_validate(cached)
+
+        read_started = time.monotonic()
+        shipment = await self.session.get(Shipment, id)
+        if shipment is not None:
+            await get_shipment_cache().set(cache_key(id), shipment.model_dump(mode="json"), read_started)
+
+        return shipment
+
+    @traced
+    async def get_updated_at(self, id: int) -> datetime | None:
+        ### Version check for conditional GETs, never loads the full row
+        if settings.CACHE_ENABLED:
+            cached = await get_shipment_cache().get(cache_key(id))
+            if cached is not None:
+                return datetime.fromisoformat(cached["updated_at"])
+
+        return await self.session.scalar(
+            select(Shipment.updated_at).where(Shipment.id == id)
+        )
+
+    @traced
+    async def get_page(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        **filters,
+    ) -> tuple[list[Shipment], str | None]:
+        shipments = list(await self.session.scalars(page_statement(limit, cursor, **filters)))
+
+        if len(shipments) > limit:
+            shipments = shipments[:limit]
+            return shipments, encode_cursor(shipments[-1])
+
+        return shipments, None
+
+    @traced
     async def add(self, shipment_create: ShipmentCreate) -> Shipment:
         new_shipment = Shipment(
             **shipment_create.model_dump(),
@@ -18,22 +115,160 @@ class ShipmentService:
             estimated_delivery=datetime.now() + timedelta(days=3)
         )
 
+        delta = RollupDelta()
+        delta.add(
+            new_shipment.status,
+            new_shipment.destination,
+            new_shipment.estimated_delivery,
+            new_shipment.weight,
+        )
+
         self.session.add(new_shipment)
+        await delta.apply(self.session)
         await self.session.commit()
         await self.session.refresh(new_shipment)
 
         return new_shipment
 
-    async def update(self, id: int, shipment_update: ShipmentUpdate) -> Shipment:
-        shipment = await self.get(id)
-        shipment.sqlmodel_update(shipment_update)
+    @traced
+    async def add_many(
+        self,
+        shipments_create: list[ShipmentCreate],
+        chunk_size: int | None = None,
+    ) -> list[Shipment]:
+        chunk_size = chunk_size or settings.BULK_INSERT_CHUNK_SIZE
+        now = datetime.now()
+        estimated_delivery = now + timedelta(days=3)
+        rows = [
+            {
+                **shipment_create.model_dump(),
+                "status": ShipmentStatus.placed,
+                "estimated_delivery": estimated_delivery,
+                "updated_at": now,
+            }
+            for shipment_create in shipments_create
+        ]
+
+        ### One multi-row INSERT ... RETURNING per chunk, all in one transaction
+        new_shipments = []
+        for start in range(0, len(rows), chunk_size):
+            result = await self.session.scalars(
+                insert(Shipment)
+                .values(rows[start:start + chunk_size])
+                .returning(Shipment)
+            )
+            new_shipments.extend(result.all())
+
+        delta = RollupDelta()
+        for row in rows:
+            delta.add(row["status"], row["destination"], row["estimated_delivery"], row["weight"])
+        await delta.apply(self.session)
+
+        await self.session.commit()
+
+        return new_shipments
+
+    @traced
+    async def update(self, id: int, shipment_update: dict) -> Shipment | None:
+        row = await self._update_returning_old(id, {**shipment_update, "updated_at": datetime.now()})
+        if row is None:
+            await self.session.rollback()
+            return None
+
+        shipment, old_status, old_estimated_delivery, old_weight = row
+        delta = RollupDelta()
+        delta.add(old_status, shipment.destination, old_estimated_delivery, old_weight, sign=-1)
+        delta.add(shipment.status, shipment.destination, shipment.estimated_delivery, shipment.weight)
+        await delta.apply(self.session)
 
-        self.session.add(shipment)
         await self.session.commit()
-        await self.session.refresh(shipment)
+        await get_shipment_cache().delete(cache_key(id))
 
         return shipment
 
-    async def delete(self, id: int) -> None:
-        await self.session.delete(await self.get(id))
-        await self.session.commit()
\ No newline at end of file
+    @traced
+    async def delete(self, id: int) -> bool:
+        ### Single DELETE ... RETURNING, False when the id doesn't exist
+        deleted_ids = await self._delete_returning(delete(Shipment).where(Shipment.id == id))
+        await get_shipment_cache().delete(cache_key(id))
+
+        return bool(deleted_ids)
+
+    @traced
+    async def delete_many(
+        self,
+        ids: list[int] | None = None,
+        status: ShipmentStatus | None = None,
+        estimated_delivery_before: datetime | None = None,
+    ) -> int:
+        statement = delete(Shipment)
+        if ids is not None:
+            statement = statement.where(Shipment.id.in_(ids))
+        if status is not None:
+            statement = statement.where(Shipment.status == status)
+        if estimated_delivery_before is not None:
+            statement = statement.where(Shipment.estimated_delivery < estimated_delivery_before)
+
+        deleted_ids = await self._delete_returning(statement)
+        await get_shipment_cache().delete_many([cache_key(deleted_id) for deleted_id in deleted_ids])
+
+        return len(deleted_ids)
+
+    async def _update_returning_old(self, id: int, values: dict) -> tuple | None:
+        """Update a shipment, returning it along with its pre-update rollup fields."""
+        old = (
+            select(Shipment.id, Shipment.status, Shipment.estimated_delivery, Shipment.weight)
+            .where(Shipment.id == id)
+            .with_for_update()
+        )
+
+        ### Postgres does it in one UPDATE ... FROM (locked old row) RETURNING
+        if self.session.bind.dialect.name == "postgresql":
+            old = old.subquery("old")
+            result = await self.session.execute(
+                update(Shipment)
+                .where(Shipment.id == old.c.id)
+                .values(**values)
+                .returning(Shipment, old.c.status, old.c.estimated_delivery, old.c.weight)
+                .execution_options(synchronize_session=False)
+            )
+            return result.first()
+
+        ### Other databases can't return FROM columns, read the old row first
+        old_row = (await self.session.execute(old)).first()
+        if old_row is None:
+            return None
+
+        shipment = await self.session.scalar(
+            update(Shipment)
+            .where(Shipment.id == id)
+            .values(**values)
+            .returning(Shipment)
+            .execution_options(synchronize_session=False)
+        )
+        ### Deleted between the SELECT and the UPDATE
+        if shipment is None:
+            return None
+        return shipment, *old_row[1:]
+
+    async def _delete_returning(self, statement) -> list[int]:
+        result = await self.session.execute(
+            statement
+            .returning(Shipment.id, Shipment.status, Shipment.destination, Shipment.estimated_delivery, Shipment.weight)
+            .execution_options(synchronize_session=False)
+        )
+
+        deleted_ids = []
+        delta = RollupDelta()
+        for id, status, destination, estimated_delivery, weight in result:
+            deleted_ids.append(id)
+            delta.add(status, destination, estimated_delivery, weight, sign=-1)
+        await delta.apply(self.session)
+
+        await self.session.commit()
+
+        return deleted_ids
+
+    @traced
+    async def stats(self) -> dict:
+        return await read_rollup(self.session)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.config import settings
+from app.database.models import Shipment, ShipmentRollup, ShipmentStatus
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("status", "destination", "delivery_day")
+
+### INSERT ... ON CONFLICT DO UPDATE constructs, per dialect
+UPSERT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+### Held by the reconciliation run, so workers don't each rebuild the rollup
+RECONCILE_LOCK_KEY = 7_202_302
+
+
+class RollupDelta:
+    """Count and weight changes to apply to shipment_rollup in one upsert."""
+
+    def __init__(self):
+        self.changes: defaultdict[tuple[str, str], list] = defaultdict(lambda: [0, 0.0])
+
+    def add(
+        self,
+        status: ShipmentStatus | str,
+        destination: int,
+        estimated_delivery: datetime,
+        weight: float,
+        sign: int = 1,
+    ) -> None:
+        keys = (
+            ("status", ShipmentStatus(status).value),
+            ("destination", str(destination)),
+            ("delivery_day", estimated_delivery.date().isoformat()),
+        )
+        for key in keys:
+            change = self.changes[key]
+            change[0] += sign
+            change[1] += sign * weight
+
+    async def apply(self, session: AsyncSession | AsyncConnection) -> None:
+        ### Sorted so concurrent upserts lock rollup rows in the same order
+        rows = [
+            {"dimension": dimension, "key": key, "count": count, "total_weight": weight}
+            for (dimension, key), (count, weight) in sorted(self.changes.items())
+            if count or weight
+        ]
+        if not rows:
+            return
+
+        dialect = (session.bind if isinstance(session, AsyncSession) else session).dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Rollup upserts aren't supported on {dialect}")
+
+        statement = UPSERT_INSERTS[dialect](ShipmentRollup).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["dimension", "key"],
+            set_={
+                "count": ShipmentRollup.count + statement.excluded.count,
+                "total_weight": ShipmentRollup.total_weight + statement.excluded.total_weight,
+            },
+        )
+        await session.execute(statement)
+
+
+async def read_rollup(session: AsyncSession) -> dict[str, Any]:
+    stats: dict[str, Any] = {f"by_{dimension}": {} for dimension in DIMENSIONS}
+    total = {"count": 0, "total_weight": 0.0}
+
+    rollups = await session.scalars(select(ShipmentRollup).where(ShipmentRollup.count > 0))
+    for rollup in rollups:
+        stats[f"by_{rollup.dimension}"][rollup.key] = {
+            "count": rollup.count,
+            "total_weight": rollup.total_weight,
+        }
+        if rollup.dimension == "status":
+            total["count"] += rollup.count
+            total["total_weight"] += rollup.total_weight
+
+    stats["total"] = total
+    return stats
+
+
+async def _rollup_drift(connection: AsyncConnection) -> RollupDelta:
+    """What shipment_rollup is off by, both sides read in the connection's current transaction."""
+    groups = {
+        "status": Shipment.status,
+        "destination": Shipment.destination,
+        "delivery_day": func.date(Shipment.estimated_delivery),
+    }
+    delta = RollupDelta()
+    for dimension, column in groups.items():
+        result = await connection.execute(
+            select(column, func.count(), func.sum(Shipment.weight)).group_by(column)
+        )
+        for key, count, weight in result:
+            key = ShipmentStatus(key).value if dimension == "status" else str(key)
+            delta.changes[(dimension, key)] = [count, weight or 0.0]
+
+    rollups = await connection.execute(
+        select(ShipmentRollup.dimension, ShipmentRollup.key, ShipmentRollup.count, ShipmentRollup.total_weight)
+    )
+    for dimension, key, count, weight in rollups:
+        change = delta.changes[(dimension, key)]
+        change[0] -= count
+        change[1] -= weight
+    return delta
+
+
+async def reconcile_rollup(engine: AsyncEngine, wait: bool = True) -> bool:
+    """
+    Fix drift between shipment_rollup and the shipment table. The full-table
+    aggregates and the rollup are read from one snapshot and only their
+    difference is applied, as an upsert like any writer's, so writers never
+    wait on the scans and deltas committed meanwhile are kept. On PostgreSQL
+    one run at a time holds an advisory lock; without wait, False is
+    returned when another run already has it.
+    """
+    async with engine.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            lock = "SELECT pg_advisory_lock(:key)" if wait else "SELECT pg_try_advisory_lock(:key)"
+            if await connection.scalar(text(lock), {"key": RECONCILE_LOCK_KEY}) is False:
+                return False
+            await connection.commit()
+
+        try:
+            if postgres:
+                ### Writers change a shipment and its rollup rows in one transaction, so one snapshot sees both or neither
+                await connection.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+                delta = await _rollup_drift(connection)
+                await connection.commit()
+            else:
+                ### SQLite serializes writers, the read and the fix share a transaction
+                delta = await _rollup_drift(connection)
+            await delta.apply(connection)
+            await connection.commit()
+            return True
+        finally:
+            if postgres:
+                await connection.rollback()
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILE_LOCK_KEY})
+                await connection.commit()
+
+
+async def reconcile_periodically() -> None:
+    from app.database.session import get_engine
+
+    while True:
+        await asyncio.sleep(settings.ROLLUP_RECONCILE_SECONDS)
+        try:
+            ### Every worker runs this loop, whichever gets the lock does the round
+            if not await reconcile_rollup(get_engine(), wait=False):
+                logger.debug("Shipment rollup reconciliation already running elsewhere")
+        except Exception:
+            logger.exception("Shipment rollup reconciliation failed")
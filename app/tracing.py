@@ -0,0 +1,281 @@
+"""
+Request tracing with OpenTelemetry-shaped spans: route, dependency
+resolution, ShipmentService calls and every SQL statement, nested through
+a ContextVar. Sampling is decided once per request at the route span, so
+unsampled requests only pay a ContextVar lookup per instrumented call.
+Finished traces go to a SpanExporter, picked by TRACING_EXPORTER.
+"""
+import functools
+import importlib
+import inspect
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Coroutine
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.exceptions import HTTPException
+
+from app.config import settings
+from app.database.query_stats import statement_rows
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start_time_unix_nano: int
+    end_time_unix_nano: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    ### Spans of the trace finished so far, shared by every span of it
+    trace: list["Span"] = field(default_factory=list, repr=False)
+
+    def end(self, end_time_unix_nano: int | None = None) -> None:
+        self.end_time_unix_nano = end_time_unix_nano or time.time_ns()
+        self.trace.append(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": (self.end_time_unix_nano - self.start_time_unix_nano) / 1_000_000,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def _id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def start_trace(name: str, **attributes: Any) -> Span | None:
+    """The root span of a request, or None when the request isn't sampled."""
+    if not settings.TRACING_ENABLED or random.random() >= settings.TRACING_SAMPLE_RATE:
+        return None
+    return Span(name, _id(128), _id(64), None, time.time_ns(), attributes=attributes)
+
+
+def start_span(name: str, parent: Span, start_time_unix_nano: int | None = None, **attributes: Any) -> Span:
+    return Span(
+        name,
+        parent.trace_id,
+        _id(64),
+        parent.span_id,
+        start_time_unix_nano or time.time_ns(),
+        attributes=attributes,
+        trace=parent.trace,
+    )
+
+
+def end_trace(root: Span) -> None:
+    root.end()
+    try:
+        get_exporter().export(root.trace)
+    except Exception:
+        ### Tracing must never fail a request
+        pass
+
+
+async def _call_in_span(span: Span, function: Callable, args: tuple, kwargs: dict) -> Any:
+    token = current_span.set(span)
+    try:
+        return await function(*args, **kwargs)
+    except BaseException as error:
+        span.status = f"error: {type(error).__name__}"
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+
+def traced(function: Callable) -> Callable:
+    """Runs an async function in a child span of the current one, if any."""
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        parent = current_span.get()
+        if parent is None:
+            return await function(*args, **kwargs)
+        return await _call_in_span(start_span(name, parent), function, args, kwargs)
+
+    return wrapper
+
+
+def _traced_endpoint(function: Callable) -> Callable:
+    """
+    Everything between the route span starting and the endpoint being
+    called is body parsing and dependency resolution, recorded as one span.
+    """
+    name = f"endpoint {function.__name__}"
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        route = current_span.get()
+        if route is None:
+            return await function(*args, **kwargs)
+        start_span("dependencies", route, route.start_time_unix_nano).end()
+        return await _call_in_span(start_span(name, route), function, args, kwargs)
+
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """Opens the root span of sampled requests around the route handler."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _traced_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request) -> Response:
+            root = start_trace(
+                f"{request.method} {self.path_format}",
+                **{"http.method": request.method, "http.route": self.path_format},
+            )
+            if root is None:
+                return await handler(request)
+
+            token = current_span.set(root)
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as error:
+                status_code = error.status_code
+                raise
+            except RequestValidationError:
+                ### Turned into a 422 by FastAPI's default handler, outside the route
+                status_code = status.HTTP_422_UNPROCESSABLE_CONTENT
+                raise
+            finally:
+                current_span.reset(token)
+                root.attributes["http.status_code"] = status_code
+                if status_code >= 500:
+                    root.status = "error"
+                end_trace(root)
+
+        return traced_handler
+
+
+### Exporters
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: list[Span]) -> None: ...
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """One JSON object per span, a trace at a time."""
+
+    def __init__(self, file: IO[bytes]):
+        self.file = file
+
+    def export(self, spans: list[Span]) -> None:
+        self.file.write(b"".join(orjson.dumps(span.to_dict()) + b"\n" for span in spans))
+        self.file.flush()
+
+
+class ConsoleSpanExporter(JsonLinesSpanExporter):
+    def __init__(self):
+        super().__init__(sys.stderr.buffer)
+
+
+class FileSpanExporter(JsonLinesSpanExporter):
+    def __init__(self, path: str | None = None):
+        super().__init__(open(path or settings.TRACING_FILE_PATH, "ab"))
+
+    def shutdown(self) -> None:
+        self.file.close()
+
+
+EXPORTERS: dict[str, Callable[[], SpanExporter]] = {
+    "console": ConsoleSpanExporter,
+    "file": FileSpanExporter,
+}
+
+_exporter: SpanExporter | None = None
+
+
+def get_exporter() -> SpanExporter:
+    """
+    TRACING_EXPORTER names a built-in exporter or a "module:attribute"
+    factory returning a SpanExporter, e.g. an adapter to an OTLP client.
+    """
+    global _exporter
+    if _exporter is None:
+        name = settings.TRACING_EXPORTER
+        if name in EXPORTERS:
+            _exporter = EXPORTERS[name]()
+        else:
+            module, _, attribute = name.partition(":")
+            _exporter = getattr(importlib.import_module(module), attribute)()
+    return _exporter
+
+
+def shutdown_exporter() -> None:
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+
+### SQL statements
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span.get()
+    span = None
+    if parent is not None:
+        span = start_span(
+            f"SQL {statement.split(None, 1)[0].upper() if statement else ''}",
+            parent,
+            **{"db.statement": statement[:1000], "db.executemany": executemany},
+        )
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = conn.info["trace_spans"].pop()
+    if span is not None:
+        span.attributes["db.rows"] = statement_rows(cursor)
+        span.end()
+
+
+def _handle_error(exception_context):
+    spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+    if spans:
+        span = spans.pop()
+        if span is not None:
+            span.status = f"error: {type(exception_context.original_exception).__name__}"
+            span.end()
+
+
+def trace_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,88 @@
+"""
+Import-time budget for worker spawn. Imports a module in fresh
+interpreters under `python -X importtime`, keeps the fastest run and
+fails when the module's cumulative import time is over --budget-ms or when
+the import has side effects it shouldn't: it runs with no database
+settings in the environment, so anything reading settings, building the
+engine or printing at import time shows up as an error or as output.
+
+The framework (FRAMEWORK_MODULES) is imported first and isn't counted.
+It is most of a worker's import time, a floor this repo can't lower, and
+it scales with the machine: app.main took 560-780 ms in total across dev
+machines, of which about 100 ms were the app's own. The budget is on that
+part, with room for a slower machine, so it catches this repo's
+regressions instead of CPU speed.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module app.cli --budget-ms 300 --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+### Heavy optional dependencies that should stay out of the import path
+LAZY_MODULES = ("scalar_fastapi", "pyarrow")
+FRAMEWORK_MODULES = ("fastapi", "sqlmodel", "sqlalchemy.ext.asyncio", "pydantic_settings")
+
+
+def import_times(module: str) -> tuple[dict[str, tuple[int, int]], str]:
+    """Self and cumulative microseconds per module imported after the framework, plus stdout."""
+    env = {
+        name: value for name, value in os.environ.items()
+        if not name.startswith(("POSTGRES_", "DATABASE_", "DB_"))
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(FRAMEWORK_MODULES)}; import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed without database settings:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match and not match[3] and match[4] in FRAMEWORK_MODULES:
+            ### Framework imports are listed first, children before their parent
+            times = {}
+        elif match:
+            times[match[4]] = (int(match[1]), int(match[2]))
+    return times, result.stdout
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to try, the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args(argv)
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    times, stdout = min(runs, key=lambda run: run[0][args.module][1])
+    total_ms = times[args.module][1] / 1000
+
+    print(
+        f"{args.module}: {total_ms:.1f} ms cumulative on top of the framework "
+        f"(budget {args.budget_ms:g} ms, best of {args.runs})"
+    )
+    print("Slowest modules by self time:")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][0])[: args.top]:
+        print(f"  {own / 1000:8.1f} ms self {cumulative / 1000:8.1f} ms cumulative  {name}")
+
+    problems = []
+    if total_ms > args.budget_ms:
+        problems.append(f"import took {total_ms:.1f} ms, over the {args.budget_ms:g} ms budget")
+    if stdout:
+        problems.append(f"import printed to stdout: {stdout.strip()[:200]!r}")
+    problems.extend(f"{name} is imported eagerly" for name in LAZY_MODULES if name in times)
+
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
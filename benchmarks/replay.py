@@ -0,0 +1,174 @@
+"""
+Replays requests recorded by RequestCaptureMiddleware against a running
+instance. Requests are sent at their recorded offsets divided by --speed
+(1 keeps the original pace, 10 is ten times faster, 0 sends them all as
+fast as --concurrency allows), then the replayed latency distribution is
+printed as JSON next to the recorded one, overall and per route.
+
+Recorded durations are measured inside the server while replayed ones
+include the client and network, so compare replays with each other and
+use the recorded numbers for the traffic shape.
+
+    REQUEST_CAPTURE_ENABLED=true uvicorn app.main:app
+    python -m benchmarks.replay request_capture.jsonl --speed 5 --output after.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load import git_commit, summarize, wait_until_ready
+
+
+def read_records(path: Path, limit: int) -> list[dict]:
+    records = []
+    with path.open() as file:
+        for line in file:
+            if line.strip():
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def route(record: dict) -> str:
+    return f"{record['method']} {record['path']}"
+
+
+def body(record: dict) -> bytes:
+    if "body_base64" in record:
+        return base64.b64decode(record["body_base64"])
+    return record.get("body", "").encode()
+
+
+class Replay:
+    def __init__(self, client: httpx.AsyncClient, records: list[dict], speed: float, concurrency: int):
+        self.client = client
+        self.records = records
+        self.speed = speed
+        self.slots = asyncio.Semaphore(concurrency)
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.status_mismatches = 0
+        self.lag = 0.0
+
+    async def send(self, record: dict) -> None:
+        async with self.slots:
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(
+                    record["method"],
+                    record["path"],
+                    params=httpx.QueryParams(record.get("query", "")),
+                    headers=record.get("headers", {}),
+                    content=body(record),
+                )
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = None
+            latency = time.perf_counter() - started
+
+        key = route(record)
+        self.latencies.setdefault(key, []).append(latency)
+        if status_code is None or status_code >= 400:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if status_code != record.get("status"):
+            self.status_mismatches += 1
+
+    async def run(self) -> float:
+        first = self.records[0]["ts"]
+        started = time.perf_counter()
+        tasks = []
+        for record in self.records:
+            if self.speed:
+                delay = (record["ts"] - first) / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    ### The runner itself fell behind the schedule
+                    self.lag = max(self.lag, -delay)
+            tasks.append(asyncio.create_task(self.send(record)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+
+def recorded(records: list[dict]) -> dict[str, list[float]]:
+    durations: dict[str, list[float]] = {}
+    for record in records:
+        durations.setdefault(route(record), []).append(record["duration_ms"] / 1000)
+    return durations
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    records = read_records(args.path, args.limit)
+    if not records:
+        raise SystemExit(f"No requests recorded in {args.path}")
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        await wait_until_ready(client)
+        runner = Replay(client, records, args.speed, args.concurrency)
+        seconds = await runner.run()
+
+    recorded_seconds = records[-1]["ts"] - records[0]["ts"]
+    recorded_durations = recorded(records)
+    recorded_errors: dict[str, int] = {}
+    for record in records:
+        if record.get("status", 500) >= 400:
+            recorded_errors[route(record)] = recorded_errors.get(route(record), 0) + 1
+
+    def both(key: str | None) -> dict:
+        if key is None:
+            replayed = [latency for latencies in runner.latencies.values() for latency in latencies]
+            original = [duration for durations in recorded_durations.values() for duration in durations]
+            errors, original_errors = sum(runner.errors.values()), sum(recorded_errors.values())
+        else:
+            replayed, original = runner.latencies[key], recorded_durations[key]
+            errors, original_errors = runner.errors.get(key, 0), recorded_errors.get(key, 0)
+        return {
+            "recorded": summarize(original, original_errors, recorded_seconds),
+            "replayed": summarize(replayed, errors, seconds),
+        }
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "source": str(args.path),
+            "base_url": args.base_url,
+            "speed": args.speed,
+            "concurrency": args.concurrency,
+            "requests": len(records),
+        },
+        "seconds": round(seconds, 3),
+        "recorded_seconds": round(recorded_seconds, 3),
+        "max_schedule_lag_ms": round(runner.lag * 1000, 3),
+        "status_mismatches": runner.status_mismatches,
+        "total": both(None),
+        "routes": {key: both(key) for key in sorted(runner.latencies)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="JSONL file written by RequestCaptureMiddleware")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1, help="Pace multiplier, 0 replays as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    parser.add_argument("--limit", type=int, default=0, help="Only replay the first N requests (0: all)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    output = json.dumps(asyncio.run(replay(args)), indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
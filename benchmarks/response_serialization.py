@@ -0,0 +1,124 @@
+"""
+Per-request CPU of GET /shipment/ with the previous response handling
+(ORM object run through response_model validation and FastAPI's encoder)
+against the orjson fast path. Both variants are single-route apps so only
+the serialization differs; the full app, which also sends conditional GET
+headers, is reported for reference. No database is needed, the service is
+replaced by a stub returning the same Shipment every time.
+
+    python -m benchmarks.response_serialization [--requests N]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+for name, value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USERNAME": "benchmark",
+    "POSTGRES_DATABASE": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.api.dependencies import ServiceDep, get_shipment_service
+from app.api.responses import ORJSONResponse, shipment_read
+from app.api.schemas.shipment import ShipmentRead
+from app.database.models import Shipment, ShipmentStatus
+from app.main import app
+
+SHIPMENT = Shipment(
+    id=1,
+    content="books",
+    weight=12.5,
+    destination=110001,
+    status=ShipmentStatus.in_transit,
+    estimated_delivery=datetime.now() + timedelta(days=3),
+    updated_at=datetime.now(),
+)
+
+
+class StubService:
+    async def get(self, id: int) -> Shipment:
+        return SHIPMENT
+
+
+async def get_stub_service() -> StubService:
+    return StubService()
+
+
+### get_shipment as it was before the fast path
+before_app = FastAPI(default_response_class=JSONResponse)
+
+
+@before_app.get("/shipment/", response_model=ShipmentRead)
+async def get_shipment_before(id: int, service: ServiceDep):
+    return await service.get(id)
+
+
+### get_shipment serialized once, straight from the ORM row
+after_app = FastAPI(default_response_class=ORJSONResponse)
+
+
+@after_app.get("/shipment/", response_model=ShipmentRead)
+async def get_shipment_after(id: int, service: ServiceDep):
+    return ORJSONResponse(shipment_read(await service.get(id)))
+
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/shipment/",
+    "raw_path": b"/shipment/",
+    "root_path": "",
+    "query_string": b"id=1",
+    "headers": [(b"host", b"benchmark")],
+    "server": ("benchmark", 80),
+    "client": ("benchmark", 1),
+}
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+async def measure(target: FastAPI, requests: int) -> float:
+    """CPU microseconds per request, calling the ASGI app directly."""
+    target.dependency_overrides[get_shipment_service] = get_stub_service
+
+    for _ in range(min(requests, 200)):
+        await target(dict(SCOPE), receive, send)
+
+    started = time.process_time()
+    for _ in range(requests):
+        await target(dict(SCOPE), receive, send)
+    return (time.process_time() - started) / requests * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5_000)
+    args = parser.parse_args()
+
+    before = asyncio.run(measure(before_app, args.requests))
+    after = asyncio.run(measure(after_app, args.requests))
+    full = asyncio.run(measure(app, args.requests))
+
+    print(f"before:   {before:8.1f} us CPU/request")
+    print(f"after:    {after:8.1f} us CPU/request ({(1 - after / before) * 100:.1f}% less)")
+    print(f"full app: {full:8.1f} us CPU/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+### The app reads its settings lazily, so they only need to be in place before the first test runs
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="shipment-tests-"), "test.db")
+os.environ.update(
+    POSTGRES_SERVER="localhost",
+    POSTGRES_PORT="5432",
+    POSTGRES_USERNAME="test",
+    POSTGRES_DATABASE="test",
+    DATABASE_URL=f"sqlite+aiosqlite:///{DATABASE_PATH}",
+    ROLLUP_RECONCILE_SECONDS="0",
+    QUERY_COUNT_WARN_THRESHOLD="0",
+    ### Off by default for multi-worker safety, the tests run in one process
+    CACHE_ENABLED="true",
+)
+
+import httpx
+import pytest
+from sqlalchemy import delete
+
+from app.database.migrations import migrate
+from app.database.models import Shipment, ShipmentRollup
+from app.database.session import async_session, get_engine
+from app.main import app
+from app.services.cache import get_shipment_cache
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "Microbenchmarks, skipped unless asked for")
+    group.addoption("--benchmark", action="store_true", help="Run tests marked benchmark against the stored baseline")
+    group.addoption("--benchmark-save", action="store_true", help="Run them and store the results as the new baseline")
+    group.addoption("--benchmark-threshold", type=float, default=0.25, help="Allowed slowdown over baseline, 0.25 = 25%%")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock timing, only run with --benchmark or --benchmark-save")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark") or config.getoption("--benchmark-save"):
+        return
+    skip = pytest.mark.skip(reason="timing test, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    """A migrated, empty database. Connections are dropped after each test, which runs its own event loop."""
+    await migrate(get_engine())
+    async with async_session() as session:
+        await session.execute(delete(Shipment))
+        await session.execute(delete(ShipmentRollup))
+        await session.commit()
+    get_shipment_cache.cache_clear()
+    yield
+    await get_engine().dispose()
+
+
+@pytest.fixture
+async def client(database):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,237 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from app.api.schemas.shipment import ShipmentCreate
+from app.database.models import ShipmentStatus
+from app.database.session import async_session
+from app.services import cache
+from app.services.cache import INVALIDATION_CHANNEL, LRUCache, MemoryCacheBackend, RemoteCacheBackend, get_shipment_cache
+from app.services.cache_server import CacheServer, serve
+from app.services.shipment import ShipmentService, cache_key
+
+pytestmark = pytest.mark.anyio
+
+SHIPMENT = {"content": "books", "weight": 2.0, "destination": 100100}
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    lru = LRUCache(max_size=2, ttl=30)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert len(lru) == 2
+
+
+def test_lru_entries_expire_after_the_ttl(clock):
+    lru = LRUCache(max_size=10, ttl=30)
+    lru.set("a", 1)
+    clock.now += 29
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_lru_counts_hits_and_misses(clock):
+    lru = LRUCache(max_size=10, ttl=30)
+    lru.get("a")
+    lru.set("a", 1)
+    lru.get("a")
+    lru.get("a")
+    clock.now += 31
+    lru.get("a")
+    assert (lru.hits, lru.misses) == (2, 2)
+
+
+async def test_fill_is_skipped_when_the_key_was_invalidated_during_the_read(clock):
+    backend = MemoryCacheBackend(max_size=10, ttl=30)
+    read_started = clock.now
+    clock.now += 0.01
+    await backend.delete("shipment:1")
+    await backend.set("shipment:1", {"id": 1}, read_started)
+    assert await backend.get("shipment:1") is None
+
+    clock.now += 0.01
+    await backend.set("shipment:1", {"id": 1}, clock.now)
+    assert await backend.get("shipment:1") == {"id": 1}
+    assert (backend.hits, backend.misses) == (1, 1)
+
+
+async def test_get_racing_a_patch_does_not_cache_the_old_row(database):
+    async with async_session() as session:
+        id = (await ShipmentService(session).add(ShipmentCreate(content="books", weight=2, destination=100100))).id
+
+    async with async_session() as session:
+        get = session.get
+
+        ### The row is read, then another request patches it before the read-through fill
+        async def get_then_patch(*args, **kwargs):
+            shipment = await get(*args, **kwargs)
+            async with async_session() as other:
+                await ShipmentService(other).update(id, {"status": ShipmentStatus.in_transit})
+            return shipment
+
+        session.get = get_then_patch
+        assert (await ShipmentService(session).get(id)).status == ShipmentStatus.placed
+
+    assert await get_shipment_cache().get(cache_key(id)) is None
+    async with async_session() as session:
+        assert (await ShipmentService(session).get(id)).status == ShipmentStatus.in_transit
+
+
+@pytest.fixture
+def remote_cache(monkeypatch):
+    """Points the shipment cache at a port with nothing listening on it."""
+    backend = RemoteCacheBackend("127.0.0.1", unused_port(), max_size=100, ttl=30)
+    monkeypatch.setattr(cache, "get_shipment_cache", lambda: backend)
+    monkeypatch.setattr("app.services.shipment.get_shipment_cache", lambda: backend)
+    return backend
+
+
+async def test_cache_server_down_falls_back_to_database(client, remote_cache):
+    await remote_cache.start()
+
+    id = (await client.post("/shipment/", json=SHIPMENT)).json()["id"]
+    response = await client.get("/shipment/", params={"id": id})
+    assert response.status_code == 200
+    assert response.json()["content"] == "books"
+
+    response = await client.patch("/shipment/", params={"id": id}, json={"status": "in_transit"})
+    assert response.status_code == 200
+
+    response = await client.delete("/shipment/", params={"id": id})
+    assert response.status_code == 200
+
+
+async def test_delete_many_is_one_round_trip():
+    server = await serve("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    backend = RemoteCacheBackend("127.0.0.1", port, max_size=100, ttl=30)
+    try:
+        for key in ("a", "b", "c"):
+            await backend.set(key, {"key": key})
+
+        writes = []
+        writer = backend._connection[1]
+        write = writer.write
+        writer.write = lambda data: (writes.append(data), write(data))[1]
+
+        await backend.delete_many(["a", "b", "c"])
+        assert len(writes) == 1
+
+        backend.near.clear()
+        assert [await backend.get(key) for key in ("a", "b", "c")] == [None, None, None]
+    finally:
+        await backend.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.fixture
+async def cache_server():
+    server = await serve("127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+async def test_cancelled_get_does_not_leave_its_reply_for_the_next_one(cache_server, monkeypatch):
+    backend = RemoteCacheBackend("127.0.0.1", cache_server, max_size=100, ttl=30)
+    try:
+        await backend.set("shipment:1", {"id": 1})
+        await backend.set("shipment:2", {"id": 2})
+        backend.near.clear()
+
+        ### Cancelled once the GET is written, before its reply is read
+        written = asyncio.Event()
+        read_reply = cache.read_reply
+
+        async def stalled_read_reply(reader):
+            written.set()
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(cache, "read_reply", stalled_read_reply)
+        request = asyncio.create_task(backend.get("shipment:1"))
+        await written.wait()
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        monkeypatch.setattr(cache, "read_reply", read_reply)
+
+        assert await backend.get("shipment:2") == {"id": 2}
+    finally:
+        await backend.close()
+
+
+async def test_unresponsive_server_is_a_miss_after_the_timeout():
+    async def never_reply(reader, writer):
+        await reader.read()
+
+    server = await asyncio.start_server(never_reply, "127.0.0.1", 0)
+    backend = RemoteCacheBackend("127.0.0.1", server.sockets[0].getsockname()[1], max_size=100, ttl=30, timeout=0.05)
+    try:
+        started = time.perf_counter()
+        assert await backend.get("shipment:1") is None
+        assert time.perf_counter() - started < 1
+    finally:
+        await backend.close()
+        server.close()
+
+
+async def until(condition, timeout: float = 2) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def test_subscription_is_reopened_when_it_drops():
+    cache_server = CacheServer()
+    server = await asyncio.start_server(cache_server.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    subscribers = cache_server.subscribers.setdefault(INVALIDATION_CHANNEL.encode(), set())
+    backend = RemoteCacheBackend("127.0.0.1", port, max_size=100, ttl=30)
+    backend.resubscribe_seconds = 0.01
+    publisher = RemoteCacheBackend("127.0.0.1", port, max_size=100, ttl=30)
+    try:
+        await backend.start()
+        await until(lambda: subscribers)
+        for writer in list(subscribers):
+            writer.close()
+        await until(lambda: not subscribers)
+        await until(lambda: subscribers)
+
+        backend.near.set("shipment:1", {"id": 1})
+        await publisher.delete("shipment:1")
+        await until(lambda: backend.near.get("shipment:1") is None)
+    finally:
+        await backend.close()
+        await publisher.close()
+        server.close()
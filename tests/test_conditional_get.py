@@ -0,0 +1,76 @@
+from email.utils import parsedate_to_datetime
+
+import pytest
+
+from app.services.cache import get_shipment_cache
+from app.services.shipment import cache_key
+
+pytestmark = pytest.mark.anyio
+
+SHIPMENT = {"content": "books", "weight": 2, "destination": 100100}
+
+
+async def created(client) -> tuple[int, str]:
+    id = (await client.post("/shipment/", json=SHIPMENT)).json()["id"]
+    response = await client.get("/shipment/", params={"id": id})
+    return id, response.headers["etag"]
+
+
+async def conditional_get(client, id: int, if_none_match: str):
+    return await client.get("/shipment/", params={"id": id}, headers={"if-none-match": if_none_match})
+
+
+async def test_get_sends_version_headers(client):
+    id = (await client.post("/shipment/", json=SHIPMENT)).json()["id"]
+    response = await client.get("/shipment/", params={"id": id})
+
+    assert response.headers["etag"].startswith(f'"{id}-')
+    assert parsedate_to_datetime(response.headers["last-modified"]).tzinfo is not None
+
+
+async def test_matching_etag_from_the_cache_is_304(client):
+    id, etag = await created(client)
+    assert await get_shipment_cache().get(cache_key(id)) is not None
+
+    response = await conditional_get(client, id, etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+async def test_matching_etag_is_304_from_the_version_query_alone(client):
+    id, etag = await created(client)
+    await get_shipment_cache().delete(cache_key(id))
+
+    response = await conditional_get(client, id, etag)
+    assert response.status_code == 304
+    assert response.headers["server-timing"].endswith('desc="1 queries, 1 rows"')
+    ### The full row was never loaded, so nothing was cached
+    assert await get_shipment_cache().get(cache_key(id)) is None
+
+
+async def test_patch_changes_the_etag(client):
+    id, etag = await created(client)
+    await client.patch("/shipment/", params={"id": id}, json={"status": "in_transit"})
+
+    response = await conditional_get(client, id, etag)
+    assert response.status_code == 200
+    assert response.json()["status"] == "in_transit"
+    assert response.headers["etag"] != etag
+    assert (await conditional_get(client, id, response.headers["etag"])).status_code == 304
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    ["*", '"0-0", {etag}', "W/{etag}", '"0-0" , W/{etag}'],
+)
+async def test_wildcard_lists_and_weak_tags_match(client, if_none_match):
+    id, etag = await created(client)
+    response = await conditional_get(client, id, if_none_match.format(etag=etag))
+    assert response.status_code == 304
+
+
+async def test_other_etags_and_missing_ids(client):
+    id, etag = await created(client)
+    assert (await conditional_get(client, id, '"0-0"')).status_code == 200
+    assert (await conditional_get(client, 999_999, "*")).status_code == 404
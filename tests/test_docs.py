@@ -0,0 +1,50 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+DOCS_URLS = ["/openapi.json", "/docs", "/redoc", "/scalar"]
+
+
+@pytest.mark.parametrize("url", DOCS_URLS)
+async def test_docs_are_served_with_validators(client, url):
+    response = await client.get(url, headers={"accept-encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers
+
+
+async def test_openapi_document_lists_the_shipment_routes(client):
+    document = (await client.get("/openapi.json")).json()
+    assert "/shipment/" in document["paths"]
+
+
+async def test_gzip_has_its_own_etag(client):
+    plain = await client.get("/openapi.json", headers={"accept-encoding": "identity"})
+    compressed = await client.get("/openapi.json", headers={"accept-encoding": "gzip"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == plain.content
+    assert compressed.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+
+
+async def test_refused_coding_falls_back_to_identity(client):
+    response = await client.get("/openapi.json", headers={"accept-encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert not response.headers["etag"].endswith('-gzip"')
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+async def test_matching_if_none_match_is_304(client, if_none_match):
+    etag = (await client.get("/docs", headers={"accept-encoding": "gzip"})).headers["etag"]
+    response = await client.get(
+        "/docs", headers={"accept-encoding": "gzip", "if-none-match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_other_codings_etag_is_not_a_match(client):
+    etag = (await client.get("/docs", headers={"accept-encoding": "identity"})).headers["etag"]
+    response = await client.get("/docs", headers={"accept-encoding": "gzip", "if-none-match": etag})
+    assert response.status_code == 200
@@ -0,0 +1,104 @@
+import csv
+import io
+
+import orjson
+import pytest
+
+from app.database.models import ShipmentStatus
+from app.services import export
+from app.services.export import (
+    ARROW_STREAM_MEDIA_TYPE,
+    EXPORT_COLUMNS,
+    arrow_schema,
+    require_pyarrow,
+    stream_shipments,
+    write_columnar,
+)
+
+pytestmark = pytest.mark.anyio
+
+SHIPMENTS = [
+    {"content": "books", "weight": 2.5, "destination": 100100},
+    {"content": "shoes", "weight": 3.0, "destination": 100200},
+    {"content": "lamps", "weight": 4.0, "destination": 100100},
+]
+
+
+@pytest.fixture
+async def shipments(client) -> list[dict]:
+    created = [(await client.post("/shipment/", json=shipment)).json() for shipment in SHIPMENTS]
+    await client.patch("/shipment/", params={"id": created[2]["id"]}, json={"status": "delivered"})
+    created[2] = {**created[2], "status": "delivered"}
+    return created
+
+
+async def test_ndjson_export_under_filters(client, shipments):
+    response = await client.get("/shipment/export", params={"destination": 100100})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [row["id"] for row in rows] == [shipments[0]["id"], shipments[2]["id"]]
+    assert {key: rows[0][key] for key in ("content", "weight", "destination", "estimated_delivery")} == {
+        key: shipments[0][key] for key in ("content", "weight", "destination", "estimated_delivery")
+    }
+    assert [row["status"] for row in rows] == ["placed", "delivered"]
+
+    response = await client.get("/shipment/export", params={"destination": 100100, "status": "placed"})
+    assert [orjson.loads(line)["id"] for line in response.content.splitlines()] == [shipments[0]["id"]]
+
+
+async def test_csv_export_under_filters(client, shipments):
+    response = await client.get("/shipment/export", params={"format": "csv", "status": "placed"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [shipments[0]["id"], shipments[1]["id"]]
+    assert rows[1]["content"] == "shoes"
+    assert float(rows[1]["weight"]) == 3.0
+    assert rows[1]["status"] == "placed"
+    assert rows[1]["estimated_delivery"] == shipments[1]["estimated_delivery"]
+
+
+async def test_export_with_no_matches_is_empty(client, shipments):
+    assert (await client.get("/shipment/export", params={"destination": 999_999})).content == b""
+
+    response = await client.get("/shipment/export", params={"format": "csv", "destination": 999_999})
+    assert response.text.splitlines() == [",".join(EXPORT_COLUMNS)]
+
+
+async def test_arrow_stream_export(client, shipments):
+    pa = pytest.importorskip("pyarrow")
+    response = await client.get("/shipment/export", params={"format": "arrow", "destination": 100100})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_STREAM_MEDIA_TYPE
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.field("status").type == pa.dictionary(pa.int8(), pa.string())
+    assert not any(field.nullable for field in table.schema)
+    assert table.column("id").to_pylist() == [shipments[0]["id"], shipments[2]["id"]]
+    assert table.column("status").to_pylist() == ["placed", "delivered"]
+    assert table.column("weight").to_pylist() == [2.5, 4.0]
+
+
+async def test_parquet_and_arrow_files(shipments, tmp_path):
+    pytest.importorskip("pyarrow")
+    require_pyarrow()
+
+    parquet = tmp_path / "shipments.parquet"
+    assert await write_columnar(str(parquet), "parquet", stream_shipments(batch_size=2)) == 3
+    pa, pq = export.pa, export.pq
+    metadata = pq.ParquetFile(parquet).metadata
+    assert [metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)] == [2, 1]
+
+    table = pq.read_table(parquet)
+    assert table.schema == arrow_schema()
+    assert table.column("id").to_pylist() == [shipment["id"] for shipment in shipments]
+    assert table.column("status").to_pylist() == ["placed", "placed", "delivered"]
+
+    arrow = tmp_path / "shipments.arrow"
+    assert await write_columnar(str(arrow), "arrow", stream_shipments(status=ShipmentStatus.placed)) == 2
+    table = pa.ipc.open_file(arrow).read_all()
+    assert table.schema.field("status").type == pa.dictionary(pa.int8(), pa.string())
+    assert table.column("content").to_pylist() == ["books", "shoes"]
@@ -0,0 +1,5 @@
+from benchmarks import import_time
+
+
+def test_app_imports_within_budget_and_without_side_effects():
+    assert import_time.main(["--runs", "3"]) == 0
@@ -0,0 +1,45 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def create(client, number: int, destination: int = 100_000) -> None:
+    ### The weight tells rows apart, list items don't carry the id
+    response = await client.post("/shipment/", json={"content": "books", "weight": 1 + number / 100, "destination": destination})
+    assert response.status_code == 200
+
+
+async def walk(client, **params) -> list[dict]:
+    items, cursor = [], None
+    while True:
+        response = await client.get("/shipment/list", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+async def test_keyset_pages_cover_every_row_once_in_order(client):
+    for number in range(23):
+        await create(client, number)
+
+    items = await walk(client, limit=5)
+    assert sorted(item["weight"] for item in items) == [1 + number / 100 for number in range(23)]
+    deliveries = [item["estimated_delivery"] for item in items]
+    assert deliveries == sorted(deliveries)
+
+
+async def test_keyset_pages_with_destination_filter(client):
+    for number in range(12):
+        await create(client, number, 100_000 + number % 3)
+
+    items = await walk(client, limit=2, destination=100_001)
+    assert len(items) == 4
+    assert {item["destination"] for item in items} == {100_001}
+
+
+async def test_invalid_cursor_is_rejected(client):
+    response = await client.get("/shipment/list", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,125 @@
+"""
+Microbenchmarks for the hot pieces of a shipment request: schema
+validation, building the Shipment in ShipmentService.add, sqlmodel_update
+and ShipmentRead serialization. No database or network needed.
+
+Absolute timings only hold on the machine that took them, so each case is
+stored in the baseline as a multiple of validating a ShipmentCreate in the
+same process. Timing tests are opt-in:
+
+    python -m pytest tests/test_micro_benchmarks.py --benchmark
+    python -m pytest tests/test_micro_benchmarks.py --benchmark --benchmark-threshold 0.5
+    python -m pytest tests/test_micro_benchmarks.py --benchmark-save
+"""
+import json
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+import orjson
+import pytest
+
+from app.api.responses import shipment_read
+from app.api.schemas.shipment import ShipmentCreate, ShipmentRead, ShipmentUpdate
+from app.database.models import Shipment, ShipmentStatus
+
+BASELINE = Path(__file__).resolve().parent.parent / "benchmarks" / "baselines" / "micro.json"
+
+CREATE_PAYLOAD = {"content": "books", "weight": 12.5, "destination": 110001}
+UPDATE_PAYLOAD = {"status": "in_transit", "estimated_delivery": "2026-01-02T10:00:00"}
+
+### sqlmodel_update warns on every call, recording each one would be most of what gets timed
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.filterwarnings("ignore::pydantic.warnings.PydanticDeprecatedSince211"),
+]
+
+
+def make_shipment() -> Shipment:
+    return Shipment(
+        id=1,
+        **CREATE_PAYLOAD,
+        status=ShipmentStatus.placed,
+        estimated_delivery=datetime.now() + timedelta(days=3),
+        updated_at=datetime.now(),
+    )
+
+
+SHIPMENT = make_shipment()
+SHIPMENT_CREATE = ShipmentCreate.model_validate(CREATE_PAYLOAD)
+UPDATE = ShipmentUpdate.model_validate(UPDATE_PAYLOAD).model_dump(exclude_none=True)
+
+
+def build_shipment() -> Shipment:
+    ### Mirrors ShipmentService.add
+    return Shipment(
+        **SHIPMENT_CREATE.model_dump(),
+        status=ShipmentStatus.placed,
+        estimated_delivery=datetime.now() + timedelta(days=3),
+    )
+
+
+def read_fast_path() -> bytes:
+    return orjson.dumps(shipment_read(SHIPMENT))
+
+
+def read_pydantic() -> str:
+    return ShipmentRead.model_validate(SHIPMENT, from_attributes=True).model_dump_json()
+
+
+CASES: dict[str, Callable[[], object]] = {
+    "shipment_update_validate_dump": lambda: ShipmentUpdate.model_validate(UPDATE_PAYLOAD).model_dump(exclude_none=True),
+    "shipment_build": build_shipment,
+    "shipment_sqlmodel_update": lambda: make_shipment().sqlmodel_update(UPDATE),
+    "shipment_read_fast_path": read_fast_path,
+    "shipment_read_pydantic": read_pydantic,
+}
+
+
+def validate_create() -> ShipmentCreate:
+    return ShipmentCreate.model_validate(CREATE_PAYLOAD)
+
+
+def relative_cost(function: Callable[[], object], repeat: int = 7) -> float:
+    """
+    Best per-call time over the best per-call time of validate_create, the
+    two timed in alternation so both see the same CPU frequency and load.
+    """
+    timers = [timeit.Timer(function), timeit.Timer(validate_create)]
+    numbers = [timer.autorange()[0] for timer in timers]
+    best = [float("inf"), float("inf")]
+    for _ in range(repeat):
+        for index, timer in enumerate(timers):
+            best[index] = min(best[index], timer.timeit(numbers[index]) / numbers[index])
+    return best[0] / best[1]
+
+
+@pytest.fixture(scope="module")
+def baseline(request) -> dict[str, float]:
+    """Stored ratios, rewritten with this run's when --benchmark-save is given."""
+    stored = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results: dict[str, float] = {}
+    yield stored if not request.config.getoption("--benchmark-save") else results
+    if request.config.getoption("--benchmark-save") and results:
+        BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE.write_text(json.dumps({**stored, **results}, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_no_regression_against_baseline(name, baseline, request):
+    ratio = round(relative_cost(CASES[name]), 3)
+    if request.config.getoption("--benchmark-save"):
+        baseline[name] = ratio
+        return
+
+    if name not in baseline:
+        pytest.skip(f"No baseline for {name}, store one with --benchmark-save")
+    threshold = request.config.getoption("--benchmark-threshold")
+    assert ratio <= baseline[name] * (1 + threshold), (
+        f"{name} costs {ratio:.3f}x a ShipmentCreate validation, baseline {baseline[name]:.3f}x"
+    )
+
+
+def test_read_fast_path_beats_pydantic():
+    assert relative_cost(read_fast_path) < relative_cost(read_pydantic)
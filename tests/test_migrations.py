@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import migrations
+from app.database.migrations import current_version, latest_version, migrate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    await engine.dispose()
+
+
+async def test_migrate_applies_pending_versions_once(engine):
+    assert [migration.version for migration in await migrate(engine, target=1)] == [1]
+    assert await current_version(engine) == 1
+
+    applied = await migrate(engine)
+    assert [migration.version for migration in applied] == list(range(2, latest_version() + 1))
+    assert await migrate(engine) == []
+    assert await current_version(engine) == latest_version()
+
+
+async def test_lock_covers_schema_version_and_every_migration(engine, monkeypatch):
+    ### SQLite has no advisory locks, stand-in statements show where they'd run
+    monkeypatch.setitem(migrations.ADVISORY_LOCKS, "sqlite", ("SELECT 'lock', :key", "SELECT 'unlock', :key"))
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    await migrate(engine)
+    assert statements[0] == "SELECT 'lock', ?"
+    assert statements[-1] == "SELECT 'unlock', ?"
+    assert not any("lock" in statement for statement in statements[1:-1])
+    assert any("schema_version" in statement for statement in statements[1:3])
@@ -0,0 +1,90 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.dialects import sqlite
+
+from app.database.models import Shipment, ShipmentStatus
+from app.database.session import async_session
+from app.services.shipment import encode_cursor, page_statement
+
+pytestmark = pytest.mark.anyio
+
+ROWS = 5_000
+START = datetime(2026, 1, 1)
+CURSOR = encode_cursor(Shipment(id=2_500, estimated_delivery=START + timedelta(hours=2_500)))
+
+### Every filter combination GET /shipment/list can send, first page and a later one
+LIST_SHAPES = {
+    "unfiltered": {},
+    "status": {"status": ShipmentStatus.in_transit},
+    "destination": {"destination": 100_042},
+    "delivery_range": {"delivery_from": START + timedelta(days=10), "delivery_to": START + timedelta(days=20)},
+    "status_and_range": {"status": ShipmentStatus.placed, "delivery_from": START + timedelta(days=10)},
+    "destination_and_range": {"destination": 100_042, "delivery_to": START + timedelta(days=100)},
+}
+
+
+@pytest.fixture
+async def seeded(database):
+    rng = random.Random(7)
+    rows = [
+        {
+            "content": "books",
+            "weight": rng.uniform(1, 25),
+            "destination": rng.randint(100_000, 100_099),
+            "status": rng.choice(list(ShipmentStatus)),
+            "estimated_delivery": START + timedelta(hours=rng.randint(0, ROWS)),
+            "updated_at": START,
+        }
+        for _ in range(ROWS)
+    ]
+    async with async_session() as session:
+        await session.execute(insert(Shipment), rows)
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+
+
+async def query_plan(statement) -> list[str]:
+    sql = statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+    async with async_session() as session:
+        result = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return [row.detail for row in result]
+
+
+def assert_indexed(plan: list[str]) -> None:
+    assert not any(step.startswith("SCAN shipment") and "INDEX" not in step for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.mark.parametrize("cursor", [None, CURSOR], ids=["first_page", "keyset_seek"])
+@pytest.mark.parametrize("filters", LIST_SHAPES.values(), ids=LIST_SHAPES.keys())
+async def test_list_pages_use_an_index_without_sorting(seeded, filters, cursor):
+    plan = await query_plan(page_statement(50, cursor, **filters))
+    assert_indexed(plan)
+    if cursor is not None:
+        ### The cursor seeks into the index instead of walking up to it
+        assert any(step.startswith("SEARCH shipment") for step in plan), plan
+
+
+async def test_lookup_by_id_uses_the_primary_key(seeded):
+    plan = await query_plan(select(Shipment).where(Shipment.id == 42))
+    assert plan == ["SEARCH shipment USING INTEGER PRIMARY KEY (rowid=?)"]
+
+
+async def test_migrations_build_the_model_indexes(database):
+    async with async_session() as session:
+        connection = await session.connection()
+        indexes = await connection.run_sync(lambda sync: inspect(sync).get_indexes("shipment"))
+    assert {index["name"]: index["column_names"] for index in indexes} == {
+        index.name: [column.name for column in index.columns] for index in Shipment.__table__.indexes
+    }
+
+
+def test_keyset_indexes_end_with_the_id_tiebreaker():
+    ### SQLite appends rowid to every index, PostgreSQL can only seek on (estimated_delivery, id) when it's there
+    for index in Shipment.__table__.indexes:
+        columns = [column.name for column in index.columns]
+        if "estimated_delivery" in columns:
+            assert columns[-2:] == ["estimated_delivery", "id"], index.name
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database.query_stats import QueryStats, current_query_stats
+from app.database.session import get_engine
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_select_rows_are_counted(client):
+    for _ in range(3):
+        await client.post("/shipment/", json={"content": "books", "weight": 1, "destination": 100_000})
+
+    response = await client.get("/shipment/list")
+    assert response.headers["server-timing"].endswith('desc="1 queries, 3 rows"')
+
+
+async def test_failed_statement_drops_its_start_time(database):
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        async with get_engine().connect() as connection:
+            with pytest.raises(OperationalError):
+                await connection.execute(text("SELECT * FROM no_such_table"))
+            started = (await connection.get_raw_connection()).info["query_started"]
+            assert started == []
+
+            await connection.execute(text("SELECT 1"))
+    finally:
+        current_query_stats.reset(token)
+    assert (stats.count, stats.rows) == (1, 1)
@@ -0,0 +1,93 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SHIPMENT = {"content": "books", "weight": 3, "destination": 100100}
+
+
+async def test_weight_is_a_float_on_every_write_and_read_path(client):
+    created = await client.post("/shipment/", json=SHIPMENT)
+    id = created.json()["id"]
+    bulk = await client.post("/shipment/bulk", json=[SHIPMENT])
+    patched = await client.patch("/shipment/", params={"id": id}, json={"status": "in_transit"})
+    fetched = await client.get("/shipment/", params={"id": id})
+    listed = await client.get("/shipment/list")
+
+    weights = [
+        created.json()["weight"],
+        bulk.json()[0]["weight"],
+        patched.json()["weight"],
+        fetched.json()["weight"],
+        *(item["weight"] for item in listed.json()["items"]),
+    ]
+    assert weights == [3.0] * 6
+    assert all(type(weight) is float for weight in weights)
+
+
+@pytest.mark.parametrize(
+    ("accept", "media_type"),
+    [
+        ("application/msgpack", "application/msgpack"),
+        ("application/json, application/msgpack;q=0.1", "application/json"),
+        ("application/msgpack;q=0", "application/json"),
+        ("application/msgpack, application/json", "application/json"),
+        ("application/json;q=0.5, application/x-msgpack", "application/msgpack"),
+        ("*/*", "application/json"),
+    ],
+)
+async def test_accept_q_values_pick_the_response_format(client, accept, media_type):
+    pytest.importorskip("msgpack")
+    id = (await client.post("/shipment/", json=SHIPMENT)).json()["id"]
+
+    response = await client.get("/shipment/", params={"id": id}, headers={"accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+
+
+async def test_each_representation_has_its_own_etag(client):
+    pytest.importorskip("msgpack")
+    id = (await client.post("/shipment/", json=SHIPMENT)).json()["id"]
+
+    as_json = await client.get("/shipment/", params={"id": id})
+    as_msgpack = await client.get("/shipment/", params={"id": id}, headers={"accept": "application/msgpack"})
+    assert as_json.headers["vary"] == as_msgpack.headers["vary"] == "Accept"
+    assert as_msgpack.headers["etag"] == as_json.headers["etag"][:-1] + '-msgpack"'
+
+    ### The JSON copy's ETag doesn't revalidate a MessagePack request
+    response = await client.get(
+        "/shipment/",
+        params={"id": id},
+        headers={"accept": "application/msgpack", "if-none-match": as_json.headers["etag"]},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+
+    response = await client.get(
+        "/shipment/",
+        params={"id": id},
+        headers={"accept": "application/msgpack", "if-none-match": as_msgpack.headers["etag"]},
+    )
+    assert response.status_code == 304
+    assert response.headers["vary"] == "Accept"
+
+
+async def test_msgpack_request_bodies(client):
+    msgpack = pytest.importorskip("msgpack")
+    headers = {"content-type": "application/msgpack", "accept": "application/msgpack"}
+
+    created = await client.post("/shipment/", content=msgpack.packb(SHIPMENT), headers=headers)
+    assert created.status_code == 200
+    id = msgpack.unpackb(created.content)["id"]
+
+    bulk = await client.post("/shipment/bulk", content=msgpack.packb([SHIPMENT, SHIPMENT]), headers=headers)
+    assert bulk.status_code == 200
+    assert [item["content"] for item in msgpack.unpackb(bulk.content)] == ["books", "books"]
+
+    patched = await client.patch(
+        "/shipment/", params={"id": id}, content=msgpack.packb({"status": "in_transit"}), headers=headers
+    )
+    assert patched.status_code == 200
+    assert msgpack.unpackb(patched.content)["status"] == "in_transit"
+
+    invalid = await client.post("/shipment/", content=msgpack.packb({"content": "books"}), headers=headers)
+    assert invalid.status_code == 422
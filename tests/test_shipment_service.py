@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import delete, select, update
+
+from app.api.schemas.shipment import ShipmentCreate
+from app.database.models import ShipmentRollup, ShipmentStatus
+from app.database.session import async_session, get_engine
+from app.services.shipment import ShipmentService
+from app.services.stats import _rollup_drift, reconcile_rollup
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_patch_of_a_shipment_deleted_mid_update_returns_none(database):
+    async with async_session() as session:
+        id = (await ShipmentService(session).add(ShipmentCreate(content="books", weight=2, destination=100100))).id
+
+    async with async_session() as session:
+        execute = session.execute
+
+        ### Another request deletes the row right after the old values are read
+        async def execute_then_delete(*args, **kwargs):
+            session.execute = execute
+            result = await execute(*args, **kwargs)
+            async with async_session() as other:
+                assert await ShipmentService(other).delete(id)
+            return result
+
+        session.execute = execute_then_delete
+        assert await ShipmentService(session).update(id, {"status": ShipmentStatus.in_transit}) is None
+
+    async with async_session() as session:
+        counts = {
+            (rollup.dimension, rollup.key): rollup.count
+            for rollup in await session.scalars(select(ShipmentRollup))
+        }
+    assert counts[("status", "placed")] == 0
+    assert counts.get(("status", "in_transit"), 0) == 0
+
+
+async def test_patch_of_a_missing_shipment_is_404(client):
+    response = await client.patch("/shipment/", params={"id": 12345}, json={"status": "in_transit"})
+    assert response.status_code == 404
+
+
+async def test_rollup_follows_add_update_and_delete(client):
+    first = (await client.post("/shipment/", json={"content": "books", "weight": 2, "destination": 100100})).json()
+    await client.post("/shipment/", json={"content": "shoes", "weight": 3, "destination": 100100})
+    await client.patch("/shipment/", params={"id": first["id"]}, json={"status": "delivered"})
+
+    stats = (await client.get("/shipment/stats")).json()
+    assert stats["total"] == {"count": 2, "total_weight": 5.0}
+    assert stats["by_status"] == {
+        "placed": {"count": 1, "total_weight": 3.0},
+        "delivered": {"count": 1, "total_weight": 2.0},
+    }
+
+    await client.delete("/shipment/", params={"id": first["id"]})
+    stats = (await client.get("/shipment/stats")).json()
+    assert stats["by_destination"] == {"100100": {"count": 1, "total_weight": 3.0}}
+
+
+async def corrupt_rollup() -> None:
+    async with get_engine().begin() as connection:
+        await connection.execute(update(ShipmentRollup).where(ShipmentRollup.dimension == "status").values(count=99))
+        await connection.execute(delete(ShipmentRollup).where(ShipmentRollup.dimension == "destination"))
+
+
+async def test_reconciliation_fixes_drift(client):
+    await client.post("/shipment/", json={"content": "books", "weight": 2, "destination": 100100})
+    await client.post("/shipment/", json={"content": "shoes", "weight": 3, "destination": 100200})
+    expected = (await client.get("/shipment/stats")).json()
+
+    await corrupt_rollup()
+    assert await reconcile_rollup(get_engine())
+    assert (await client.get("/shipment/stats")).json() == expected
+
+
+async def test_reconciliation_keeps_writes_committed_after_its_snapshot(client):
+    await client.post("/shipment/", json={"content": "books", "weight": 2, "destination": 100100})
+    await corrupt_rollup()
+
+    ### What the PostgreSQL path does: read the drift in one transaction, fix it in another
+    async with get_engine().connect() as connection:
+        delta = await _rollup_drift(connection)
+        await connection.commit()
+    await client.post("/shipment/", json={"content": "shoes", "weight": 3, "destination": 100100})
+    async with get_engine().begin() as connection:
+        await delta.apply(connection)
+
+    stats = (await client.get("/shipment/stats")).json()
+    assert stats["total"] == {"count": 2, "total_weight": 5.0}
+    assert stats["by_destination"] == {"100100": {"count": 2, "total_weight": 5.0}}
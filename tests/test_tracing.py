@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import event
+
+from app import tracing
+from app.config import get_settings
+from app.database.session import get_engine
+from app.tracing import Span, SpanExporter, trace_engine
+
+pytestmark = pytest.mark.anyio
+
+
+class ListSpanExporter(SpanExporter):
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter(monkeypatch, database):
+    exporter = ListSpanExporter()
+    monkeypatch.setattr(get_settings(), "TRACING_ENABLED", True)
+    monkeypatch.setattr(get_settings(), "TRACING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    ### The engine is shared across tests, so its SQL listeners only stay for this one
+    engine = get_engine().sync_engine
+    trace_engine(get_engine())
+    yield exporter
+    event.remove(engine, "before_cursor_execute", tracing._before_cursor_execute)
+    event.remove(engine, "after_cursor_execute", tracing._after_cursor_execute)
+    event.remove(engine, "handle_error", tracing._handle_error)
+
+
+def root(exporter: ListSpanExporter) -> Span:
+    return next(span for span in exporter.spans if span.parent_span_id is None)
+
+
+async def test_validation_error_is_not_a_server_error(client, exporter):
+    response = await client.post("/shipment/", json={"content": "books"})
+    assert response.status_code == 422
+
+    span = root(exporter)
+    assert span.attributes["http.status_code"] == 422
+    assert span.status == "ok"
+
+
+async def test_not_found_is_not_a_server_error(client, exporter):
+    response = await client.get("/shipment/", params={"id": 999_999})
+    assert response.status_code == 404
+    assert root(exporter).attributes["http.status_code"] == 404
+    assert root(exporter).status == "ok"
+
+
+async def test_sql_span_counts_selected_rows(client, exporter):
+    for _ in range(3):
+        await client.post("/shipment/", json={"content": "books", "weight": 1, "destination": 100_000})
+    exporter.spans.clear()
+
+    await client.get("/shipment/list")
+    [select] = [span for span in exporter.spans if span.name == "SQL SELECT"]
+    assert select.attributes["db.rows"] == 3
+
+
+def test_exporter_must_implement_export():
+    with pytest.raises(TypeError):
+        SpanExporter()